@@ -31,7 +31,10 @@ import click
 from pywcmp.ets import ets
 from pywcmp.bundle import bundle
 from pywcmp.kpi import kpi
+from pywcmp.report import report
+from pywcmp.serve import serve
 from pywcmp.util import get_package_version
+from pywcmp.validate import validate
 
 __version__ = get_package_version()
 
@@ -45,3 +48,6 @@ def cli():
 cli.add_command(ets)
 cli.add_command(bundle)
 cli.add_command(kpi)
+cli.add_command(report)
+cli.add_command(serve)
+cli.add_command(validate)
@@ -0,0 +1,820 @@
+###############################################################################
+#
+# Authors: Tom Kralidis <tomkralidis@gmail.com>
+#
+# Copyright (c) 2026 Tom Kralidis
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+# batch validation of records from archives (zip, tar) and (optionally
+# compressed) NDJSON, streamed without extraction to disk
+
+from array import array
+import bz2
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import gzip
+import hashlib
+import io
+import json
+import logging
+import lzma
+import mmap
+import os
+from pathlib import Path
+import re
+import struct
+import tarfile
+import tempfile
+import time
+from typing import BinaryIO, Iterator, Union
+import zipfile
+
+import click
+
+from pywcmp.util import MAX_RECORD_SIZE, parse_wcmp
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+LOGGER = logging.getLogger(__name__)
+
+# number of records handed to workers ahead of the reports written
+RECORDS_IN_FLIGHT_PER_WORKER = 4
+
+# minimum interval between checkpoints of a batch run, in seconds
+CHECKPOINT_INTERVAL = 30
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+TAR_REGEX = re.compile(r'\.(tar(\.(gz|bz2|xz|zst|zstd))?|tgz)$')
+NDJSON_REGEX = re.compile(r'\.(jsonl|ndjson)(\.(gz|bz2|xz|zst|zstd))?$')
+SHARD_REGEX = re.compile(r'^(\d+)/(\d+)$')
+
+# sidecar line offset index of (uncompressed) NDJSON: magic, size and
+# modification time (ns) of the NDJSON file, followed by the offset of
+# each line (unsigned 64-bit integers, native byte order)
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'PYWCMPI1'
+INDEX_HEADER = struct.Struct('=8sQQ')
+
+
+def is_batch_input(path: str) -> bool:
+    """
+    Helper function to test whether a path is a batch of records (zip or
+    tar archive, or NDJSON)
+
+    :param path: `str` of path
+
+    :returns: `bool` of whether path is a batch of records
+    """
+
+    name = str(path).lower()
+
+    return (name.endswith('.zip') or TAR_REGEX.search(name) is not None or
+            NDJSON_REGEX.search(name) is not None)
+
+
+def open_stream(path: Path) -> BinaryIO:
+    """
+    Open a (possibly compressed) file as a stream, decompressing on the fly
+
+    :param path: `pathlib.Path` of file
+
+    :returns: binary file-like object
+    """
+
+    suffix = path.suffix.lower()
+
+    if suffix in ['.gz', '.tgz']:
+        return gzip.open(path, 'rb')
+    elif suffix == '.bz2':
+        return bz2.open(path, 'rb')
+    elif suffix == '.xz':
+        return lzma.open(path, 'rb')
+    elif suffix in ['.zst', '.zstd']:
+        if zstd is None:
+            msg = 'zstandard is required for zstd compressed input'
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+        if hasattr(zstd, 'ZstdDecompressor'):  # zstandard
+            return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(
+                path.open('rb'), closefd=True))
+        return zstd.open(path, 'rb')
+
+    return path.open('rb')
+
+
+def parse_shard(ctx, param, value: str) -> Union[tuple, None]:
+    """
+    Helper function to parse a shard option (`i/N`, e.g. `1/4`)
+
+    :param ctx: `click.Context`
+    :param param: `click.Parameter`
+    :param value: `str` of option value
+
+    :returns: `tuple` of shard number (1-based) and number of shards,
+              or `None`
+    """
+
+    if value is None:
+        return None
+
+    match = SHARD_REGEX.match(value)
+    if match is None or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise click.BadParameter(f'Invalid shard {value} (expected i/N, '
+                                 'with 1 <= i <= N)')
+
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_shard_range(count: int, shard: Union[tuple, None]) -> range:
+    """
+    Helper function to derive the records of a shard (a contiguous slice)
+
+    :param count: `int` of number of records
+    :param shard: `tuple` of shard number (1-based) and number of shards,
+                  or `None` for all records
+
+    :returns: `range` of record positions
+    """
+
+    if shard is None:
+        return range(count)
+
+    number, shards = shard
+
+    return range(count * (number - 1) // shards, count * number // shards)
+
+
+def iter_records(path: str, shard: tuple = None) -> Iterator[tuple]:
+    """
+    Iterate over the records of a file: members of a zip or tar archive
+    (`.json` files), lines of NDJSON, or a single record
+
+    With a shard, only the records of the shard are read: a contiguous
+    slice of the members of a zip archive or of the lines of NDJSON
+    (through its line offset index), or every Nth record of tar archives
+    and compressed NDJSON (which can only be read sequentially)
+
+    :param path: `str` of path
+    :param shard: optional `tuple` of shard number (1-based) and number
+                  of shards
+
+    :returns: iterator of `tuple` of record source (`str`) and content
+              (`bytes`, or `RuntimeError` if the record cannot be read)
+    """
+
+    path_ = Path(path)
+    name = path_.name.lower()
+
+    if name.endswith('.zip'):
+        yield from _iter_zip_records(path_, shard)
+    elif name.endswith(('.jsonl', '.ndjson')) and shard is not None:
+        yield from _iter_indexed_records(path_, shard)
+    elif TAR_REGEX.search(name) is not None:
+        yield from _select_shard(_iter_tar_records(path_), shard)
+    elif NDJSON_REGEX.search(name) is not None:
+        yield from _select_shard(_iter_ndjson_records(path_), shard)
+    else:
+        with open_stream(path_) as fh:
+            yield str(path), fh.read()
+
+
+def get_index_path(path: Path) -> Path:
+    """
+    Helper function to derive the path of the line offset index of NDJSON
+
+    :param path: `pathlib.Path` of NDJSON file
+
+    :returns: `pathlib.Path` of sidecar index file
+    """
+
+    return path.with_name(f'{path.name}{INDEX_SUFFIX}')
+
+
+def build_index(path: Path) -> array:
+    """
+    Build the line offset index of NDJSON, and write it as a sidecar file
+    (if the directory is writable)
+
+    :param path: `pathlib.Path` of NDJSON file
+
+    :returns: `array.array` of line offsets
+    """
+
+    LOGGER.info(f'Building line offset index of {path}')
+
+    stat = path.stat()
+    offsets = array('Q')
+    position = 0
+
+    with path.open('rb') as fh:
+        for _, size in _read_lines(fh):
+            offsets.append(position)
+            position += size
+
+    index_path = get_index_path(path)
+    header = INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns)
+
+    try:
+        with tempfile.NamedTemporaryFile(
+                'wb', dir=index_path.parent, suffix='.tmp',
+                delete=False) as fh:
+            fh.write(header)
+            offsets.tofile(fh)
+        os.replace(fh.name, index_path)
+    except OSError as err:
+        LOGGER.warning(f'Cannot write line offset index: {err}')
+
+    return offsets
+
+
+def load_index(path: Path) -> array:
+    """
+    Load the line offset index of NDJSON, building it if missing or out
+    of date
+
+    :param path: `pathlib.Path` of NDJSON file
+
+    :returns: `array.array` of line offsets
+    """
+
+    index_path = get_index_path(path)
+    stat = path.stat()
+
+    try:
+        with index_path.open('rb') as fh:
+            header = fh.read(INDEX_HEADER.size)
+            size = os.fstat(fh.fileno()).st_size - INDEX_HEADER.size
+
+            if (len(header) == INDEX_HEADER.size and size % 8 == 0 and
+                    INDEX_HEADER.unpack(header) == (INDEX_MAGIC, stat.st_size,
+                                                    stat.st_mtime_ns)):
+                LOGGER.debug(f'Using line offset index {index_path}')
+                offsets = array('Q')
+                offsets.fromfile(fh, size // 8)
+                return offsets
+    except (OSError, EOFError):
+        LOGGER.debug(f'No line offset index of {path}')
+        return build_index(path)
+
+    LOGGER.debug(f'Line offset index of {path} is out of date')
+
+    return build_index(path)
+
+
+def _iter_indexed_records(path: Path, shard: tuple) -> Iterator[tuple]:
+    offsets = load_index(path)
+    lines = get_shard_range(len(offsets), shard)
+
+    if not lines:
+        return
+
+    with path.open('rb') as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in lines:
+                source = f'{path}:{line + 1}'
+                end = offsets[line + 1] if line + 1 < len(offsets) else len(mm)  # noqa
+                if end - offsets[line] > MAX_RECORD_SIZE:
+                    yield source, _too_large(source)
+                    continue
+
+                content = mm[offsets[line]:end]
+                if content.strip():
+                    yield source, content
+
+
+def _select_shard(records: Iterator[tuple],
+                  shard: Union[tuple, None]) -> Iterator[tuple]:
+    if shard is None:
+        yield from records
+        return
+
+    number, shards = shard
+    for count, record in enumerate(records):
+        if count % shards == number - 1:
+            yield record
+
+
+def _iter_zip_records(path: Path, shard: tuple = None) -> Iterator[tuple]:
+    with zipfile.ZipFile(path) as zf:
+        members = [info for info in zf.infolist()
+                   if not info.is_dir() and
+                   info.filename.lower().endswith('.json')]
+
+        for position in get_shard_range(len(members), shard):
+            info = members[position]
+            source = f'{path}!{info.filename}'
+            if info.file_size > MAX_RECORD_SIZE:
+                yield source, _too_large(source)
+                continue
+
+            with zf.open(info) as fh:
+                yield source, fh.read()
+
+
+def _iter_tar_records(path: Path) -> Iterator[tuple]:
+    with open_stream(path) as stream:
+        # streaming mode: members are read in order, without seeking
+        with tarfile.open(fileobj=stream, mode='r|') as tf:
+            for member in tf:
+                if not member.isfile() or not member.name.lower().endswith('.json'):  # noqa
+                    continue
+
+                source = f'{path}!{member.name}'
+                if member.size > MAX_RECORD_SIZE:
+                    yield source, _too_large(source)
+                    continue
+
+                yield source, tf.extractfile(member).read()
+
+
+def _iter_ndjson_records(path: Path) -> Iterator[tuple]:
+    with open_stream(path) as stream:
+        for count, (line, _) in enumerate(_read_lines(stream), 1):
+            if line is None:
+                source = f'{path}:{count}'
+                yield source, _too_large(source)
+            elif line.strip():
+                yield f'{path}:{count}', line
+
+
+def _read_lines(stream: BinaryIO) -> Iterator[tuple]:
+    # lines are read at most MAX_RECORD_SIZE bytes at a time, so that an
+    # overlong line is skipped (yielded as None) without holding it whole
+    while True:
+        line = stream.readline(MAX_RECORD_SIZE + 1)
+        if not line:
+            return
+
+        size = len(line)
+        if size <= MAX_RECORD_SIZE:
+            yield line, size
+            continue
+
+        while not line.endswith(b'\n'):
+            line = stream.readline(MAX_RECORD_SIZE + 1)
+            if not line:
+                break
+            size += len(line)
+
+        yield None, size
+
+
+def _too_large(source: str) -> RuntimeError:
+    # logged (with its source) once validated, see `validate_content`
+    return RuntimeError(f'Record too large (> {MAX_RECORD_SIZE} bytes)')
+
+
+@functools.cache
+def get_validator():
+    """
+    Helper function to get the ETS validator of batch workers, created
+    once per process
+
+    :returns: `pywcmp.wcmp2.ets.WMOCoreMetadataProfileValidator2`
+    """
+
+    from pywcmp.wcmp2.ets import WMOCoreMetadataProfileValidator2
+
+    return WMOCoreMetadataProfileValidator2()
+
+
+@functools.cache
+def get_evaluator():
+    """
+    Helper function to get the KPI evaluator of batch workers, created
+    once per process
+
+    :returns: `pywcmp.wcmp2.kpi.WMOCoreMetadataProfileKPIEvaluator`
+    """
+
+    from pywcmp.wcmp2.kpi import WMOCoreMetadataProfileKPIEvaluator
+
+    return WMOCoreMetadataProfileKPIEvaluator()
+
+
+def validate_content(source: str, content: bytes, report_type: str,
+                     options: dict) -> dict:
+    """
+    Validate the content of a record
+
+    :param source: `str` of record source
+    :param content: `bytes` of record (or exception if not readable)
+    :param report_type: `str` of report type (`ets`, `kpi` or `validate`
+                        for both)
+    :param options: `dict` of validation options (keyword arguments of
+                    `WMOCoreMetadataProfileValidator2.validate`,
+                    `WMOCoreMetadataProfileKPIEvaluator.evaluate` (and
+                    `fail_on_ets`) or `pywcmp.validate.validate_record`)
+
+    :returns: `dict` of report, with record source (or error)
+    """
+
+    from pywcmp.validate import validate_record
+
+    try:
+        if isinstance(content, Exception):
+            raise content
+
+        data = parse_wcmp(content)
+
+        if report_type == 'ets':
+            report = get_validator().validate(data, **options)
+        elif report_type == 'kpi':
+            options = options.copy()
+            if options.pop('fail_on_ets', True):
+                get_validator().validate(data, fail_on_schema_validation=True)
+            report = get_evaluator().evaluate(data, **options)
+        else:
+            report = validate_record(data, validator=get_validator(),
+                                     evaluator=get_evaluator(), **options)
+    except Exception as err:
+        LOGGER.warning(f'{source}: {err}')
+        return {'source': source, 'error': str(err)}
+
+    return {'source': source, **report}
+
+
+def validate_records(records: Iterator[tuple], report_type: str,
+                     workers: int = 1, **options) -> Iterator[dict]:
+    """
+    Validate a batch of records, in order
+
+    :param records: iterator of `tuple` of record source and content (see
+                    `iter_records`)
+    :param report_type: `str` of report type (`ets`, `kpi` or `validate`)
+    :param workers: number of worker processes (`1` to validate in the
+                    calling process)
+    :param options: validation options (see `validate_content`)
+
+    :returns: iterator of `dict` of reports (see `validate_content`)
+    """
+
+    if workers == 1:
+        for source, content in records:
+            yield validate_content(source, content, report_type, options)
+        return
+
+    # a bounded number of records are in flight, so that arbitrarily
+    # large batches are streamed through the workers
+    max_in_flight = workers * RECORDS_IN_FLIGHT_PER_WORKER
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = deque()
+        for source, content in records:
+            futures.append(executor.submit(
+                validate_content, source, content, report_type, options))
+
+            if len(futures) >= max_in_flight:
+                yield futures.popleft().result()
+
+        while futures:
+            yield futures.popleft().result()
+
+
+def has_failed(report: dict) -> bool:
+    """
+    Helper function to test whether a record failed validation
+
+    :param report: `dict` of report (see `validate_content`)
+
+    :returns: `bool` of whether the record failed (ETS) validation or
+              could not be validated
+    """
+
+    if 'error' in report:
+        return True
+
+    summary = report.get('ets', report)['summary']
+
+    return summary.get('FAILED', 0) > 0
+
+
+def dump_report(report: dict) -> str:
+    """
+    Helper function to serialize a report as a line of NDJSON
+
+    :param report: `dict` of report
+
+    :returns: `str` of NDJSON line
+    """
+
+    return json.dumps(report, separators=(',', ':'))
+
+
+class Checkpoint:
+    """
+    Checkpoint of a batch run: the records done (by source and content
+    hash), the offset of their reports in the output, and whether they
+    failed validation
+    """
+
+    def __init__(self, path: Path, run: dict,
+                 interval: int = CHECKPOINT_INTERVAL):
+        """
+        initializer
+
+        :param path: `pathlib.Path` of checkpoint file
+        :param run: `dict` of batch run (input and options), which a
+                    resumed run must match
+        :param interval: minimum interval between checkpoints, in seconds
+
+        :returns: `pywcmp.batch.Checkpoint`
+        """
+
+        self.path = path
+        self.run = json.loads(json.dumps(run))
+        self.interval = interval
+        self.offset = 0
+        self.records = {}
+
+        self._saved = time.monotonic()
+
+    def load(self) -> None:
+        """
+        Load the checkpoint of an interrupted run
+
+        :returns: `None`
+        """
+
+        try:
+            with self.path.open() as fh:
+                content = json.load(fh)
+        except FileNotFoundError:
+            LOGGER.info(f'No checkpoint {self.path}; starting from scratch')
+            return
+        except (OSError, ValueError) as err:
+            msg = f'Invalid checkpoint {self.path}: {err}'
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+
+        if content.get('run') != self.run:
+            msg = f'Checkpoint {self.path} is of a different batch run'
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+
+        self.offset = content['offset']
+        self.records = content['records']
+
+        LOGGER.info(f'Resuming after {len(self.records)} records')
+
+    def is_done(self, source: str, hash_: str) -> bool:
+        """
+        Test whether a record is done
+
+        :param source: `str` of record source
+        :param hash_: `str` of hash of record content (or error)
+
+        :returns: `bool` of whether the record is done
+        """
+
+        record = self.records.get(source)
+
+        return record is not None and record['hash'] == hash_
+
+    def add(self, source: str, hash_: str, offset: int,
+            failed: bool) -> None:
+        """
+        Mark a record as done
+
+        :param source: `str` of record source
+        :param hash_: `str` of hash of record content (or error)
+        :param offset: `int` of offset of the report in the output
+        :param failed: `bool` of whether the record failed validation
+
+        :returns: `None`
+        """
+
+        self.records[source] = {
+            'hash': hash_,
+            'offset': offset,
+            'failed': failed
+        }
+
+    @property
+    def failed(self) -> int:
+        """
+        Number of records failing validation
+
+        :returns: `int` of number of records failing validation
+        """
+
+        return sum(record['failed'] for record in self.records.values())
+
+    def save(self, output: BinaryIO, force: bool = False) -> None:
+        """
+        Save the checkpoint (if due), once the output is on disk
+
+        :param output: binary file-like object of output
+        :param force: `bool` of whether to save regardless of interval
+
+        :returns: `None`
+        """
+
+        if not force and time.monotonic() - self._saved < self.interval:
+            return
+
+        output.flush()
+        os.fsync(output.fileno())
+        self.offset = output.tell()
+
+        LOGGER.debug(f'Saving checkpoint ({len(self.records)} records)')
+        with tempfile.NamedTemporaryFile(
+                'w', dir=self.path.parent, suffix='.tmp',
+                delete=False) as fh:
+            json.dump({
+                'run': self.run,
+                'offset': self.offset,
+                'records': self.records
+            }, fh)
+        os.replace(fh.name, self.path)
+
+        self._saved = time.monotonic()
+
+
+def run_batch(path: str, report_type: str, workers: int = 1,
+              summarize=None, shard: tuple = None, output: str = None,
+              resume: bool = False, **options) -> int:
+    """
+    Validate the records of a file, writing reports as NDJSON (one line
+    per record) to stdout or to an output file.  Runs writing to an
+    output file are checkpointed (to `<output>.checkpoint`), and can be
+    resumed, skipping the records done.  Raises `ValueError` on invalid
+    options, and `RuntimeError` if the records, output or checkpoint
+    cannot be read or written
+
+    :param path: `str` of path (see `iter_records`)
+    :param report_type: `str` of report type (`ets`, `kpi` or `validate`)
+    :param workers: number of worker processes
+    :param summarize: optional function to summarize reports with
+    :param shard: optional `tuple` of shard number (1-based) and number
+                  of shards, to only validate the records of a shard
+    :param output: optional `str` of path of output file
+    :param resume: `bool` of whether to resume an interrupted run (from
+                   its checkpoint)
+    :param options: validation options (see `validate_content`)
+
+    :returns: `int` of number of records failing validation
+    """
+
+    if resume and output is None:
+        msg = 'Resuming a batch run requires an output file'
+        LOGGER.error(msg)
+        raise ValueError(msg)
+
+    checkpoint = None
+    output_fh = None
+    pending = deque()
+
+    if output is not None:
+        output = Path(output)
+        checkpoint = Checkpoint(
+            output.with_name(f'{output.name}{CHECKPOINT_SUFFIX}'), {
+                'input': str(Path(path).resolve()),
+                'report_type': report_type,
+                'summary': summarize is not None,
+                'shard': shard,
+                'options': options
+            })
+
+        try:
+            if resume:
+                checkpoint.load()
+                size = output.stat().st_size if output.exists() else 0
+                if size < checkpoint.offset:
+                    msg = (f'Output {output} is missing or shorter than its '
+                           f'checkpoint ({size} < {checkpoint.offset} bytes)'
+                           '; rerun without --resume')
+                    LOGGER.error(msg)
+                    raise RuntimeError(msg)
+            output_fh = output.open('r+b' if resume and output.exists()
+                                    else 'wb')
+        except OSError as err:
+            msg = f'Cannot open output {output}: {err}'
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+
+        # reports written after the last checkpoint are redone (the output
+        # is never shorter than the checkpoint offset here)
+        output_fh.truncate(checkpoint.offset)
+        output_fh.seek(checkpoint.offset)
+
+    def records_to_validate():
+        skipped = 0
+        for source, content in iter_records(path, shard):
+            hash_ = None
+            if checkpoint is not None:
+                # records that cannot be read are done by their error
+                if isinstance(content, Exception):
+                    hash_ = f'error: {content}'
+                else:
+                    hash_ = hashlib.sha256(content).hexdigest()
+                if checkpoint.is_done(source, hash_):
+                    skipped += 1
+                    continue
+            pending.append((source, hash_))
+            yield source, content
+
+        if skipped:
+            LOGGER.info(f'Skipped {skipped} records done')
+
+    failed = 0
+
+    LOGGER.info(f'Validating records of {path}')
+    try:
+        for report in validate_records(records_to_validate(), report_type,
+                                       workers, **options):
+            source, hash_ = pending.popleft()
+            report_failed = has_failed(report)
+            if report_failed:
+                failed += 1
+            if summarize is not None and 'error' not in report:
+                report = {'source': report['source'], **summarize(report)}
+
+            if output_fh is None:
+                click.echo(dump_report(report))
+            else:
+                offset = output_fh.tell()
+                output_fh.write(f'{dump_report(report)}\n'.encode('utf-8'))
+                checkpoint.add(source, hash_, offset, report_failed)
+                checkpoint.save(output_fh)
+    except (OSError, EOFError, RuntimeError, zipfile.BadZipFile,
+            tarfile.TarError, lzma.LZMAError) as err:
+        msg = f'Cannot read {path}: {err}'
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+    finally:
+        if output_fh is not None:
+            checkpoint.save(output_fh, force=True)
+            output_fh.close()
+
+    if checkpoint is not None:
+        return checkpoint.failed
+
+    return failed
+
+
+def get_batch_options(function):
+    """
+    Define CLI options of batches of records
+    """
+
+    function = click.option(
+        '--resume', is_flag=True, default=False,
+        help='Resume an interrupted run from its checkpoint, skipping the '
+             'records done (requires --output)')(function)
+    function = click.option(
+        '--output', '-O', type=click.Path(dir_okay=False, writable=True),
+        help='Write reports of a batch of records to file (NDJSON), '
+             'checkpointed to <output>.checkpoint')(function)
+    function = click.option(
+        '--shard', callback=parse_shard,
+        help='Only validate shard i of N of a batch of records '
+             '(e.g. 1/4)')(function)
+    function = click.option(
+        '--workers', '-w', default=1, type=click.IntRange(min=1),
+        help='Number of worker processes, for batches of records '
+             '(zip/tar archives, NDJSON) (default: 1)')(function)
+    return function
+
+
+def check_batch_options(shard: tuple = None, output: str = None,
+                        resume: bool = False) -> None:
+    """
+    Helper function to check CLI options of batches of records, when
+    validating a single record
+
+    :param shard: `tuple` of shard option
+    :param output: `str` of output option
+    :param resume: `bool` of resume option
+
+    :returns: `None`
+    """
+
+    if shard is not None or output is not None or resume:
+        msg = '--shard, --output and --resume require a batch of records'
+        raise click.UsageError(msg)
@@ -23,12 +23,17 @@
 #
 ###############################################################################
 
+from datetime import datetime, timezone
+import hashlib
 import io
+import json
 import logging
 import os
 from pathlib import Path
 import shutil
+import tarfile
 import tempfile
+from typing import Union
 import zipfile
 
 import click
@@ -38,16 +43,177 @@ from pywcmp.util import (get_cli_common_options, get_userdir, urlopen_,
 
 LOGGER = logging.getLogger(__name__)
 
-USERDIR = get_userdir()
+# bundles are installed into versioned directories (<userdir>/versions),
+# and the active version is selected by an atomically replaced pointer
+# file (<userdir>/current)
+# number of installed bundle versions to keep (including the active one)
+BUNDLE_VERSIONS_KEEP = 2
 
-TEMPDIR = tempfile.TemporaryDirectory()
-TEMPDIR2 = Path(tempfile.TemporaryDirectory().name)
+BUNDLE_DIRS = ['wcmp-2', 'wis2-topic-hierarchy']
 
-WCMP2_FILES_TEMP = TEMPDIR2 / 'wcmp-2'
-WIS2_TOPIC_HIERARCHY_DIR_TEMP = TEMPDIR2 / 'wis2-topic-hierarchy'
 
-WCMP2_FILES = get_userdir() / 'wcmp-2'
-WIS2_TOPIC_HIERARCHY_DIR = get_userdir() / 'wis2-topic-hierarchy'
+def get_bundle_version() -> Union[str, None]:
+    """
+    Helper function to get the version of the active bundle
+
+    :returns: `str` of bundle version, or `None` if no versioned
+              bundle is installed
+    """
+
+    try:
+        version = (get_userdir() / 'current').read_text().strip()
+    except OSError:
+        return None
+
+    return version or None
+
+
+def get_bundle_dir() -> Path:
+    """
+    Helper function to get the directory of the active bundle
+
+    Callers should resolve the directory once and read all artifacts
+    from it, so that a concurrent bundle install is never seen partially.
+    Reading a bundle never writes to the bundle location, so a shared
+    bundle can be mounted read-only.
+
+    :returns: `Path` of active bundle directory
+    """
+
+    version = get_bundle_version()
+
+    if version is None:
+        LOGGER.debug('No versioned bundle found, using legacy layout')
+        return get_userdir()
+
+    return get_userdir() / 'versions' / version
+
+
+def get_bundle_dir_version(bundle_dir: Path) -> Union[str, None]:
+    """
+    Helper function to get the version of a (resolved) bundle directory
+
+    :param bundle_dir: `Path` of bundle directory
+
+    :returns: `str` of bundle version, or `None` if the bundle is not
+              versioned (legacy layout)
+    """
+
+    if bundle_dir.parent == get_userdir() / 'versions':
+        return bundle_dir.name
+
+    return None
+
+
+def get_bundle_manifest(bundle_dir: Path = None) -> dict:
+    """
+    Helper function to get the manifest (SHA-256 digest of each artifact)
+    of a bundle
+
+    :param bundle_dir: `Path` of bundle directory (default is active bundle)
+
+    :returns: `dict` of artifact (relative path) to digest
+    """
+
+    if bundle_dir is None:
+        bundle_dir = get_bundle_dir()
+
+    manifest_file = bundle_dir / 'manifest.json'
+
+    if manifest_file.exists():
+        LOGGER.debug(f'Reading bundle manifest {manifest_file}')
+        with manifest_file.open() as fh:
+            return json.load(fh)
+
+    LOGGER.debug(f'Generating bundle manifest for {bundle_dir}')
+    manifest = {}
+
+    for dir_ in BUNDLE_DIRS:
+        for file_ in sorted((bundle_dir / dir_).rglob('*')):
+            if file_.is_file():
+                artifact = file_.relative_to(bundle_dir).as_posix()
+                manifest[artifact] = hashlib.sha256(
+                    file_.read_bytes()).hexdigest()
+
+    return manifest
+
+
+def diff_bundle_manifests(old: dict, new: dict) -> list:
+    """
+    Helper function to derive the artifacts that differ between two
+    bundle manifests
+
+    :param old: `dict` of old bundle manifest
+    :param new: `dict` of new bundle manifest
+
+    :returns: `list` of added, removed or changed artifacts
+    """
+
+    artifacts = set(old) | set(new)
+
+    return sorted(a for a in artifacts if old.get(a) != new.get(a))
+
+
+def install_bundle(srcdir: Path) -> str:
+    """
+    Install a bundle directory as a new version and atomically make it
+    the active bundle
+
+    :param srcdir: `Path` of staged bundle directory (ideally on the same
+                   filesystem as the bundle location)
+
+    :returns: `str` of installed bundle version
+    """
+
+    userdir = get_userdir()
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    version_dir = userdir / 'versions' / version
+
+    LOGGER.debug(f'Writing bundle manifest for {srcdir}')
+    (srcdir / 'manifest.json').unlink(missing_ok=True)
+    manifest = get_bundle_manifest(srcdir)
+    with (srcdir / 'manifest.json').open('w') as fh:
+        json.dump(manifest, fh, indent=4)
+
+    LOGGER.debug(f'Installing bundle {srcdir} as {version_dir}')
+    version_dir.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(srcdir, version_dir)
+
+    LOGGER.debug(f'Switching active bundle to {version}')
+    pointer = userdir / f'.current-{version}'
+    pointer.write_text(version)
+    os.replace(pointer, userdir / 'current')
+
+    for legacy_dir in BUNDLE_DIRS:
+        if (userdir / legacy_dir).is_dir():
+            LOGGER.debug(f'Removing legacy bundle directory {legacy_dir}')
+            shutil.rmtree(userdir / legacy_dir, ignore_errors=True)
+
+    prune_bundles()
+
+    return version
+
+
+def prune_bundles(keep: int = BUNDLE_VERSIONS_KEEP) -> None:
+    """
+    Remove old bundle versions
+
+    The previous version(s) are kept so that readers which resolved the
+    bundle directory before a switch can finish reading.
+
+    :param keep: number of most recent versions to keep
+
+    :returns: `None`
+    """
+
+    current = get_bundle_version()
+    versions_dir = get_userdir() / 'versions'
+    versions = sorted(p.name for p in versions_dir.iterdir() if p.is_dir())
+
+    for version in versions[:-keep]:
+        if version != current:
+            LOGGER.debug(f'Removing bundle version {version}')
+            shutil.rmtree(versions_dir / version, ignore_errors=True)
 
 
 @click.group()
@@ -56,15 +222,129 @@ def bundle():
     pass
 
 
-@click.command()
-@get_cli_common_options
-@click.pass_context
-def sync(ctx, logfile, verbosity):
-    """Sync configuration bundle"""
+def sync_bundle(source: Union[Path, str] = None) -> str:
+    """
+    Sync configuration bundle (schemas, codelists and topic hierarchy)
+
+    :param source: optional local bundle directory or archive (zip or tar)
+                   to install from instead of downloading
+
+    :returns: `str` of installed bundle version
+    """
 
-    setup_logger(verbosity, logfile)
     LOGGER.debug('Caching schemas, codelists and topic hierarchy')
 
+    userdir = get_userdir()
+    LOGGER.debug(f'Bundle location: {userdir}')
+
+    userdir.mkdir(parents=True, exist_ok=True)
+    stagingdir = Path(tempfile.mkdtemp(prefix='.staging-', dir=userdir))
+
+    try:
+        if source is None:
+            _download_bundle(stagingdir)
+        else:
+            _copy_bundle(Path(source), stagingdir)
+
+        for bundle_dir in BUNDLE_DIRS:
+            if not (stagingdir / bundle_dir).is_dir():
+                msg = f'Invalid bundle: missing {bundle_dir}'
+                LOGGER.error(msg)
+                raise RuntimeError(msg)
+
+        version = install_bundle(stagingdir)
+    finally:
+        if stagingdir.exists():
+            LOGGER.debug(f'Cleaning up {stagingdir}')
+            shutil.rmtree(stagingdir, ignore_errors=True)
+
+    return version
+
+
+def export_bundle(filepath: Union[Path, str]) -> None:
+    """
+    Export the active bundle to an archive, for provisioning other
+    hosts with `pywcmp bundle sync --from`
+
+    :param filepath: `Path` of archive to write (`.zip`, `.tar`,
+                     `.tar.gz` or `.tgz`)
+
+    :returns: `None`
+    """
+
+    filepath = Path(filepath)
+    bundle_dir = get_bundle_dir()
+
+    for dir_ in BUNDLE_DIRS:
+        if not (bundle_dir / dir_).is_dir():
+            msg = "Bundle missing. Run 'pywcmp bundle sync' to cache"
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+
+    LOGGER.debug(f'Exporting {bundle_dir} to {filepath}')
+    if filepath.name.endswith('.zip'):
+        with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as z:
+            for dir_ in BUNDLE_DIRS:
+                for file_ in sorted((bundle_dir / dir_).rglob('*')):
+                    z.write(file_, file_.relative_to(bundle_dir))
+    elif filepath.name.endswith(('.tar', '.tar.gz', '.tgz')):
+        mode = 'w' if filepath.name.endswith('.tar') else 'w:gz'
+        with tarfile.open(filepath, mode) as t:
+            for dir_ in BUNDLE_DIRS:
+                t.add(bundle_dir / dir_, dir_)
+    else:
+        msg = f'Unsupported archive format: {filepath.name}'
+        LOGGER.error(msg)
+        raise ValueError(msg)
+
+
+def _copy_bundle(source: Path, stagingdir: Path) -> None:
+    """
+    Copy bundle artifacts from a local directory or archive
+
+    :param source: `Path` of bundle directory or archive.  A directory
+                   can be an exported/extracted bundle or another bundle
+                   location (in which case its active version is used)
+    :param stagingdir: `Path` of directory to copy artifacts into
+
+    :returns: `None`
+    """
+
+    if source.is_dir():
+        if (source / 'current').is_file():
+            version = (source / 'current').read_text().strip()
+            source = source / 'versions' / version
+
+        LOGGER.debug(f'Copying bundle from directory {source}')
+        for dir_ in BUNDLE_DIRS:
+            if (source / dir_).is_dir():
+                shutil.copytree(source / dir_, stagingdir / dir_)
+    elif zipfile.is_zipfile(source):
+        LOGGER.debug(f'Extracting bundle from zipfile {source}')
+        with zipfile.ZipFile(source) as z:
+            z.extractall(stagingdir)
+    elif tarfile.is_tarfile(source):
+        LOGGER.debug(f'Extracting bundle from tarfile {source}')
+        with tarfile.open(source) as t:
+            t.extractall(stagingdir, filter='data')
+    else:
+        msg = f'Invalid bundle source: {source}'
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+
+def _download_bundle(stagingdir: Path) -> None:
+    """
+    Download bundle artifacts
+
+    :param stagingdir: `Path` of directory to download artifacts into
+
+    :returns: `None`
+    """
+
+    WCMP2_FILES_TEMP = stagingdir / 'wcmp-2'
+    WIS2_TOPIC_HIERARCHY_DIR_TEMP = stagingdir / 'wis2-topic-hierarchy'
+
     LOGGER.debug('Caching WCMP2 artifacts')
     LOGGER.debug(f'Downloading WCMP2 schema to {WCMP2_FILES_TEMP}')
     WCMP2_FILES_TEMP.mkdir(parents=True, exist_ok=True)
@@ -72,13 +352,13 @@ def sync(ctx, logfile, verbosity):
 
     json_schema = WCMP2_FILES_TEMP / 'wcmp2-bundled.json'
     with json_schema.open('wb') as fh:
-        fh.write(urlopen_(f'{WCMP2_SCHEMA}').read())
+        fh.write(urlopen_(WCMP2_SCHEMA, allow_unverified=True).read())
 
     WCMP2_CODELISTS = WCMP2_FILES_TEMP / 'codelists'
     LOGGER.debug(f'Downloading WCMP2 codelists to {WCMP2_CODELISTS}')
     WCMP2_CODELISTS.mkdir(parents=True, exist_ok=True)
     CODELISTS_URL = 'https://github.com/wmo-im/wcmp2-codelists/archive/refs/heads/main.zip'  # noqa
-    FH = io.BytesIO(urlopen_(CODELISTS_URL).read())
+    FH = io.BytesIO(urlopen_(CODELISTS_URL, allow_unverified=True).read())
     with zipfile.ZipFile(FH) as z:
         LOGGER.debug(f'Processing zipfile "{z.filename}"')
         for name in z.namelist():
@@ -98,7 +378,7 @@ def sync(ctx, logfile, verbosity):
     WIS2_TOPIC_HIERARCHY_DIR_TEMP.mkdir(parents=True, exist_ok=True)
 
     ZIPFILE_URL = 'https://wmo-im.github.io/wis2-topic-hierarchy/wth-bundle.zip'  # noqa
-    FH = io.BytesIO(urlopen_(ZIPFILE_URL).read())
+    FH = io.BytesIO(urlopen_(ZIPFILE_URL, allow_unverified=True).read())
     with zipfile.ZipFile(FH) as z:
         LOGGER.debug(f'Processing zipfile "{z.filename}"')
         for name in z.namelist():
@@ -114,17 +394,44 @@ def sync(ctx, logfile, verbosity):
     IANA_URL = 'https://www.iana.org/assignments/link-relations/link-relations-1.csv'  # noqa
     iana_file = WCMP2_FILES_TEMP / 'link-relations-1.csv'
     with iana_file.open('wb') as fh:
-        fh.write(urlopen_(f'{IANA_URL}').read())
+        fh.write(urlopen_(IANA_URL, allow_unverified=True).read())
+
+
+@click.command()
+@get_cli_common_options
+@click.pass_context
+@click.option('--from', '-f', 'source',
+              type=click.Path(exists=True, readable=True),
+              help='Sync from a local bundle directory or archive')
+def sync(ctx, logfile, verbosity, source=None):
+    """Sync configuration bundle"""
+
+    setup_logger(verbosity, logfile)
+
+    try:
+        version = sync_bundle(source)
+    except RuntimeError as err:
+        raise click.ClickException(err)
+
+    click.echo(f'Installed bundle version {version}')
 
-    LOGGER.debug(f'Removing {USERDIR}')
-    if USERDIR.exists():
-        shutil.rmtree(USERDIR)
 
-    LOGGER.debug(f'Moving files from {TEMPDIR2} to {USERDIR}')
-    shutil.move(TEMPDIR2, USERDIR)
+@click.command()
+@get_cli_common_options
+@click.pass_context
+@click.argument('filepath', type=click.Path(dir_okay=False, writable=True))
+def export(ctx, filepath, logfile, verbosity):
+    """Export configuration bundle to an archive"""
+
+    setup_logger(verbosity, logfile)
+
+    try:
+        export_bundle(filepath)
+    except (RuntimeError, ValueError) as err:
+        raise click.ClickException(err)
 
-    LOGGER.debug(f'Cleaning up {TEMPDIR}')
-    TEMPDIR.cleanup()
+    click.echo(f'Exported bundle to {filepath}')
 
 
 bundle.add_command(sync)
+bundle.add_command(export)
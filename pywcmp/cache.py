@@ -0,0 +1,282 @@
+###############################################################################
+#
+# Authors: Tom Kralidis <tomkralidis@gmail.com>
+#
+# Copyright (c) 2026 Tom Kralidis
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+# cache of reports, keyed by record, options and bundle version
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Union
+
+from pywcmp.bundle import get_bundle_version
+from pywcmp.util import get_package_version, get_record_hash
+from pywcmp.wcmp2.ets import get_bundle_resources
+
+LOGGER = logging.getLogger(__name__)
+
+DISK_CACHE_FACTOR = 10
+DISK_CACHE_LOW_WATER = 0.9
+
+
+def get_bundle_key() -> Union[str, None]:
+    """
+    Helper function to identify the active bundle in cache keys
+
+    :returns: `str` of bundle version, or of the digest of the bundle
+              manifest for legacy (unversioned) bundles, or `None` if
+              no bundle is installed
+    """
+
+    version = get_bundle_version()
+
+    if version is not None:
+        return version
+
+    # legacy bundles all share the same (missing) version, so they are
+    # told apart by content
+    try:
+        manifest = get_bundle_resources()['manifest']
+    except RuntimeError:
+        return None
+
+    return hashlib.sha256(
+        json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_cache_key(record: dict, report_type: str, **options) -> str:
+    """
+    Helper function to derive the cache key of a report
+
+    :param record: `dict` of record
+    :param report_type: `str` of report type (`ets` or `kpi`)
+    :param options: options the report was generated with
+
+    :returns: `str` of cache key
+    """
+
+    key = json.dumps([
+        get_package_version(),
+        get_bundle_key(),
+        report_type,
+        get_record_hash(record),
+        options
+    ], sort_keys=True)
+
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """In-memory LRU cache of reports, optionally backed by disk"""
+
+    def __init__(self, size: int = 256, ttl: Union[int, None] = None,
+                 directory: Union[Path, str, None] = None,
+                 disk_size: Union[int, None] = None):
+        """
+        initializer
+
+        :param size: maximum number of reports kept in memory
+        :param ttl: time to live of a report, in seconds (`None` for no
+                    expiry)
+        :param directory: optional directory to persist reports to
+        :param disk_size: maximum number of reports kept on disk (default
+                          `DISK_CACHE_FACTOR` times `size`).  Once
+                          exceeded, the least recently used reports are
+                          removed, down to `DISK_CACHE_LOW_WATER` of
+                          `disk_size`
+
+        :returns: `pywcmp.cache.ReportCache`
+        """
+
+        self.size = size
+        self.ttl = ttl
+        self.disk_size = disk_size or size * DISK_CACHE_FACTOR
+        self.directory = None
+
+        if directory is not None:
+            self.directory = Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+        # number of reports on disk, counted at the first write and
+        # estimated from writes since (reports may be shared with other
+        # processes)
+        self._disk_count = None
+
+    def get(self, key: str) -> Union[tuple, None]:
+        """
+        Get a report from the cache
+
+        :param key: `str` of cache key
+
+        :returns: `tuple` of report (`dict`) and time of caching (`float`),
+                  or `None` if not cached (or expired)
+        """
+
+        with self._lock:
+            entry = self._reports.get(key)
+            if entry is not None:
+                self._reports.move_to_end(key)
+
+        if entry is None and self.directory is not None:
+            entry = self._read(key)
+            if entry is not None:
+                self._put(key, entry)
+
+        if entry is None:
+            LOGGER.debug(f'Cache miss: {key}')
+            return None
+
+        if self.ttl is not None and time.time() - entry[1] > self.ttl:
+            LOGGER.debug(f'Cache entry expired: {key}')
+            self.delete(key)
+            return None
+
+        LOGGER.debug(f'Cache hit: {key}')
+        return entry
+
+    def put(self, key: str, report: dict) -> None:
+        """
+        Add a report to the cache
+
+        :param key: `str` of cache key
+        :param report: `dict` of report
+
+        :returns: `None`
+        """
+
+        entry = (report, time.time())
+
+        self._put(key, entry)
+
+        if self.directory is not None:
+            self._write(key, entry)
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a report from the cache
+
+        :param key: `str` of cache key
+
+        :returns: `None`
+        """
+
+        with self._lock:
+            self._reports.pop(key, None)
+
+        if self.directory is not None:
+            (self.directory / f'{key}.json').unlink(missing_ok=True)
+
+    def _put(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._reports[key] = entry
+            self._reports.move_to_end(key)
+
+            while len(self._reports) > self.size:
+                self._reports.popitem(last=False)
+
+    def _read(self, key: str) -> Union[tuple, None]:
+        filepath = self.directory / f'{key}.json'
+
+        try:
+            with filepath.open() as fh:
+                content = json.load(fh)
+            # modification time tracks last use, for pruning
+            os.utime(filepath)
+            return content['report'], content['cached']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, key: str, entry: tuple) -> None:
+        try:
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=self.directory, suffix='.tmp',
+                    delete=False) as fh:
+                json.dump({'report': entry[0], 'cached': entry[1]}, fh)
+            os.replace(fh.name, self.directory / f'{key}.json')
+        except OSError as err:
+            LOGGER.warning(f'Cannot write report to cache: {err}')
+
+        with self._lock:
+            if self._disk_count is not None:
+                self._disk_count += 1
+                if self._disk_count <= self.disk_size:
+                    return
+            # the directory is only scanned once full, and pruned below
+            # the limit, so that scans are occasional
+            self._disk_count = self.disk_size
+
+        self._prune()
+
+    def _prune(self) -> None:
+        entries = []
+
+        for filepath in self.directory.glob('*.json'):
+            try:
+                entries.append((filepath.stat().st_mtime, filepath))
+            except OSError:  # removed concurrently
+                continue
+
+        keep = len(entries)
+        if keep > self.disk_size:
+            keep = int(self.disk_size * DISK_CACHE_LOW_WATER)
+            entries.sort()
+
+            for _, filepath in entries[:len(entries) - keep]:
+                LOGGER.debug(f'Pruning cached report {filepath}')
+                filepath.unlink(missing_ok=True)
+
+        with self._lock:
+            self._disk_count = keep
+
+
+def with_cache_metadata(report: dict, cached: Union[float, None]) -> dict:
+    """
+    Helper function to add cache metadata to a report
+
+    :param report: `dict` of report
+    :param cached: `float` of time the report was cached, or `None` if
+                   the report was just generated
+
+    :returns: `dict` of report with cache metadata
+    """
+
+    cache = {
+        'hit': cached is not None
+    }
+
+    if cached is not None:
+        cache['cached'] = datetime.fromtimestamp(
+            cached, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    return {**report, 'cache': cache}
@@ -32,9 +32,20 @@ import json
 
 import click
 
-from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
-from pywcmp.util import (get_cli_common_options, parse_wcmp, setup_logger,
-                         urlopen_)
+from pywcmp.batch import (check_batch_options, get_batch_options,
+                          is_batch_input, run_batch)
+from pywcmp.util import (fetch_record, get_cli_common_options, parse_wcmp,
+                         setup_logger)
+
+
+def __getattr__(name: str):
+    # the test suite is imported on first use, which keeps CLI startup
+    # (e.g. as a thin client of `pywcmp serve`) fast
+    if name == 'WMOCoreMetadataProfileTestSuite2':
+        from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
+        return WMOCoreMetadataProfileTestSuite2
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 @click.group()
@@ -52,34 +63,87 @@ def ets():
               help='Stop the ETS on failing schema validation')
 @click.option('--relax-centre-id-checks', '-r', is_flag=True,
               default=False, help='Relax centre identifier based checks')
+@click.option('--previous-report', '-p',
+              type=click.File(), help='Previous ETS report of the record; '
+              'only tests affected by bundle changes are run')
+@click.option('--server', '-S', envvar='PYWCMP_SERVER',
+              help='Forward to a running validation service '
+                   '(http://host:port or unix:///path/to/socket)')
+@get_batch_options
 def validate(ctx, file_or_url, logfile, verbosity,
              fail_on_schema_validation=True,
-             relax_centre_id_checks=False):
+             relax_centre_id_checks=False, previous_report=None,
+             server=None, workers=1, shard=None, output=None,
+             resume=False):
     """validate against the abstract test suite"""
 
     setup_logger(verbosity, logfile)
 
+    if is_batch_input(file_or_url) and not file_or_url.startswith('http'):
+        if previous_report is not None:
+            msg = '--previous-report requires a single record'
+            raise click.UsageError(msg)
+
+        try:
+            failed = run_batch(
+                file_or_url, 'ets', workers, shard=shard,
+                output=output, resume=resume,
+                fail_on_schema_validation=fail_on_schema_validation,
+                relax_centre_id_checks=relax_centre_id_checks)
+        except ValueError as err:
+            raise click.UsageError(err)
+        except RuntimeError as err:
+            raise click.ClickException(err)
+        ctx.exit(1 if failed else 0)
+
+    check_batch_options(shard, output, resume)
+
+    if previous_report is not None:
+        try:
+            previous_report = json.load(previous_report)
+        except json.decoder.JSONDecodeError as err:
+            raise click.ClickException(f'Invalid previous report: {err}')
+
     click.echo(f'Opening {file_or_url}')
 
     if file_or_url.startswith('http'):
-        content = urlopen_(file_or_url).read()
+        try:
+            content = fetch_record(file_or_url)
+        except RuntimeError as err:
+            raise click.ClickException(err)
     else:
         with open(file_or_url) as fh:
             content = fh.read()
 
     click.echo(f'Validating {file_or_url}')
 
+    if server is not None and previous_report is None:
+        from pywcmp.serve import request_report
+
+        try:
+            results = request_report(
+                server, 'ets', content,
+                fail_on_schema_validation=fail_on_schema_validation,
+                relax_centre_id_checks=relax_centre_id_checks)
+        except (RuntimeError, ValueError) as err:
+            raise click.ClickException(err)
+
+        click.echo(json.dumps(results, indent=4))
+        ctx.exit(results['summary']['FAILED'])
+
     try:
         data = parse_wcmp(content)
     except Exception as err:
         raise click.ClickException(err)
         ctx.exit(1)
 
+    from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
+
     click.echo('Detected WCMP2 discovery metadata')
     ts = WMOCoreMetadataProfileTestSuite2(data)
     try:
         results = ts.run_tests(fail_on_schema_validation,
-                               relax_centre_id_checks)
+                               relax_centre_id_checks, previous_report)
     except Exception as err:
         raise click.ClickException(err)
         ctx.exit(1)
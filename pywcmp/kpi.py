@@ -33,12 +33,10 @@ import logging
 
 import click
 
-from pywcmp.ets import WMOCoreMetadataProfileTestSuite2
-from pywcmp.wcmp2.kpi import (
-    WMOCoreMetadataProfileKeyPerformanceIndicators as wcmp_kpis2
-)
-from pywcmp.util import (get_cli_common_options, parse_wcmp, setup_logger,
-                         urlopen_)
+from pywcmp.batch import (check_batch_options, get_batch_options,
+                          is_batch_input, run_batch)
+from pywcmp.util import (fetch_record, get_cli_common_options, parse_wcmp,
+                         setup_logger)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -58,26 +56,78 @@ def kpi():
 @click.option('--summary', '-s', is_flag=True, default=False,
               help='Provide summary of KPI test results')
 @click.option('--kpi', '-k', help='KPI to run, default is all')
+@click.option('--offline', '-o', is_flag=True, default=False,
+              help='Skip KPIs requiring network access')
+@click.option('--deadline', '-d', type=click.FloatRange(min=0),
+              help='Time budget of the evaluation, in seconds (links not '
+                   'checked in time are reported as not evaluated)')
+@click.option('--server', '-S', envvar='PYWCMP_SERVER',
+              help='Forward to a running validation service '
+                   '(http://host:port or unix:///path/to/socket)')
+@get_batch_options
 def validate(ctx, file_or_url, summary, kpi, logfile, verbosity,
-             fail_on_ets=True):
+             fail_on_ets=True, offline=False, deadline=None, server=None,
+             workers=1, shard=None, output=None, resume=False):
     """run key performance indicators"""
 
     setup_logger(verbosity, logfile)
 
+    if is_batch_input(file_or_url) and not file_or_url.startswith('http'):
+        try:
+            failed = run_batch(
+                file_or_url, 'kpi', workers, shard=shard,
+                output=output, resume=resume,
+                summarize=(summarize_report if summary and kpi is None
+                           else None),
+                fail_on_ets=fail_on_ets, kpi=kpi, deadline=deadline,
+                offline=offline)
+        except ValueError as err:
+            raise click.UsageError(err)
+        except RuntimeError as err:
+            raise click.ClickException(err)
+        ctx.exit(1 if failed else 0)
+
+    check_batch_options(shard, output, resume)
+
     if file_or_url.startswith('http'):
-        content = urlopen_(file_or_url).read()
+        try:
+            content = fetch_record(file_or_url)
+        except RuntimeError as err:
+            raise click.ClickException(err)
     else:
         with open(file_or_url) as fh:
             content = fh.read()
 
     click.echo(f'Validating {file_or_url}')
 
+    if server is not None:
+        from pywcmp.serve import request_report
+
+        try:
+            kpis_results = request_report(server, 'kpi', content, kpi=kpi,
+                                          fail_on_ets=fail_on_ets,
+                                          offline=offline, deadline=deadline)
+        except (RuntimeError, ValueError) as err:
+            raise click.ClickException(err)
+
+        if not summary or kpi is not None:
+            click.echo(json.dumps(kpis_results, indent=4))
+        else:
+            click.echo(json.dumps(kpis_results['summary'], indent=4))
+
+        return
+
     try:
         data = parse_wcmp(content)
     except Exception as err:
         raise click.ClickException(err)
         ctx.exit(1)
 
+    from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
+    from pywcmp.wcmp2.kpi import (
+        WMOCoreMetadataProfileKeyPerformanceIndicators as wcmp_kpis2
+    )
+
     if fail_on_ets:
         ts = WMOCoreMetadataProfileTestSuite2(data)
         try:
@@ -89,7 +139,7 @@ def validate(ctx, file_or_url, summary, kpi, logfile, verbosity,
     kpis = wcmp_kpis2(data)
 
     try:
-        kpis_results = kpis.evaluate(kpi)
+        kpis_results = kpis.evaluate(kpi, deadline, offline)
     except ValueError as err:
         raise click.UsageError(f'Invalid KPI {kpi}: {err}')
         ctx.exit(1)
@@ -100,4 +150,19 @@ def validate(ctx, file_or_url, summary, kpi, logfile, verbosity,
         click.echo(json.dumps(kpis_results['summary'], indent=4))
 
 
+def summarize_report(report: dict) -> dict:
+    """
+    Helper function to summarize a KPI report
+
+    :param report: `dict` of KPI report
+
+    :returns: `dict` of KPI summary
+    """
+
+    return {
+        'metadata_id': report['metadata_id'],
+        'summary': report['summary']
+    }
+
+
 kpi.add_command(validate)
@@ -46,6 +46,46 @@
 #     processor:
 #         name: pywcmp.pygeoapi_plugin.WCMP2KPIProcessor
 #
+# pywcmp-wis2-wcmp2-ets-batch:
+#     type: process
+#     processor:
+#         name: pywcmp.pygeoapi_plugin.WCMP2ETSBatchProcessor
+#
+# pywcmp-wis2-wcmp2-kpi-batch:
+#     type: process
+#     processor:
+#         name: pywcmp.pygeoapi_plugin.WCMP2KPIBatchProcessor
+#
+# Reports are cached in memory (LRU), keyed by record, process inputs and
+# bundle version, so that resubmitting an identical record returns the
+# cached report.  The cache can be configured per process, e.g.:
+#
+# pywcmp-wis2-wcmp2-kpi:
+#     type: process
+#     processor:
+#         name: pywcmp.pygeoapi_plugin.WCMP2KPIProcessor
+#         cache:
+#             size: 256  # maximum number of reports kept in memory
+#             ttl: 3600  # time to live of a report, in seconds
+#             dir: /var/cache/pywcmp  # persist reports to disk (optional)
+#             disk_size: 2560  # maximum number of reports kept on disk
+#
+# KPI evaluations (which check remote links) are subject to admission
+# control: a maximum number of concurrent KPI jobs, a bounded queue of
+# waiting jobs (further jobs are rejected immediately) and a shared,
+# bounded thread pool for link checks.  Admission control can be
+# configured per process, e.g.:
+#
+# pywcmp-wis2-wcmp2-kpi:
+#     type: process
+#     processor:
+#         name: pywcmp.pygeoapi_plugin.WCMP2KPIProcessor
+#         admission:
+#             max_jobs: 4  # maximum number of concurrent KPI jobs
+#             max_queue: 16  # maximum number of waiting KPI jobs
+#             queue_timeout: 60  # maximum wait of a KPI job, in seconds
+#             link_workers: 16  # size of thread pool for link checks
+#
 # 3. (re)start pygeoapi
 #
 # The resulting processes will be available at the following endpoints:
@@ -54,22 +94,60 @@
 #
 # /processes/pywcmp-wis2-wcmp2-kpi
 #
+# /processes/pywcmp-wis2-wcmp2-ets-batch
+#
+# /processes/pywcmp-wis2-wcmp2-kpi-batch
+#
 # Note that pygeoapi's OpenAPI/Swagger interface (at /openapi) will also
 # provide a developer-friendly interface to test and run requests
 #
 
 
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 import json
 import logging
+import threading
+from typing import Union
 
 from pygeoapi.process.base import BaseProcessor, ProcessorExecuteError
 
-from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
-from pywcmp.wcmp2.kpi import WMOCoreMetadataProfileKeyPerformanceIndicators
-from pywcmp.util import get_package_version, THISDIR, urlopen_
+from pywcmp.cache import get_cache_key, ReportCache, with_cache_metadata
+from pywcmp.wcmp2.ets import (get_bundle_resources,
+                              WMOCoreMetadataProfileTestSuite2)
+from pywcmp.wcmp2.kpi import (MAX_LINK_WORKERS, ROUND,
+                              WMOCoreMetadataProfileKeyPerformanceIndicators,
+                              WMOCoreMetadataProfileKPIEvaluator)
+from pywcmp.util import (fetch_record, get_package_version, get_spellchecker,
+                         THISDIR)
 
 LOGGER = logging.getLogger(__name__)
 
+# maximum number of remote records fetched concurrently in batch processes
+# (per pygeoapi worker process, shared by all batch jobs)
+MAX_FETCH_WORKERS = 8
+
+# default maximum number of reports kept in memory, per process
+CACHE_SIZE = 256
+
+# default time to live of cached KPI reports, in seconds (links health
+# and graphic overview results depend on remote resources)
+KPI_CACHE_TTL = 3600
+
+# default admission control of KPI jobs (per pygeoapi worker process)
+MAX_KPI_JOBS = 4
+MAX_KPI_QUEUE = 16
+KPI_QUEUE_TIMEOUT = 60
+
+_REPORT_CACHES = {}
+_REPORT_CACHES_LOCK = threading.Lock()
+
+_ADMISSION_CONTROLLERS = {}
+_ADMISSION_CONTROLLERS_LOCK = threading.Lock()
+
+_FETCH_EXECUTOR = None
+_FETCH_EXECUTOR_LOCK = threading.Lock()
+
 with (THISDIR / 'resources' / 'ets-report.json').open() as fh:
     ETS_REPORT_SCHEMA = json.load(fh)
 
@@ -184,6 +262,33 @@ PROCESS_WCMP2_KPI = {
             'maxOccurs': 1,
             'metadata': None,
             'keywords': ['wcmp2']
+        },
+        'deadline': {
+            'title': 'Deadline',
+            'description': 'Time budget of the evaluation of a record, in '
+                           'seconds (links not checked in time are '
+                           'reported as not evaluated)',
+            'schema': {
+                'type': 'number',
+                'exclusiveMinimum': 0
+            },
+            'minOccurs': 0,
+            'maxOccurs': 1,
+            'metadata': None,
+            'keywords': ['deadline', 'timeout']
+        },
+        'offline': {
+            'title': 'Offline',
+            'description': 'Skip KPIs requiring network access (graphic '
+                           'overview, links health)',
+            'schema': {
+                'type': 'boolean',
+                'default': False
+            },
+            'minOccurs': 0,
+            'maxOccurs': 1,
+            'metadata': None,
+            'keywords': ['offline']
         }
     },
     'outputs': {
@@ -204,6 +309,385 @@ PROCESS_WCMP2_KPI = {
 }
 
 
+BATCH_RECORDS_INPUT = {
+    'title': 'WCMP2 records',
+    'description': 'WCMP2 records (each can be inline or remote link)',
+    'schema': {
+        'type': 'array',
+        'minItems': 1,
+        'items': {
+            'type': ['object', 'string']
+        }
+    },
+    'minOccurs': 1,
+    'maxOccurs': 1,
+    'metadata': None,
+    'keywords': ['wcmp2']
+}
+
+
+PROCESS_WCMP2_ETS_BATCH = {
+    'version': get_package_version(),
+    'id': 'pywcmp-wis2-wcmp2-ets-batch',
+    'title': {
+        'en': 'WCMP2 ETS batch validator'
+    },
+    'description': {
+        'en': 'Validate a batch of WCMP2 documents against the ETS'
+    },
+    'keywords': ['wis2', 'wcmp2', 'ets', 'test suite', 'metadata', 'batch'],
+    'links': PROCESS_WCMP2_ETS['links'],
+    'jobControlOptions': ['sync-execute', 'async-execute'],
+    'inputs': {
+        'records': BATCH_RECORDS_INPUT,
+        'fail_on_schema_validation': (
+            PROCESS_WCMP2_ETS['inputs']['fail_on_schema_validation']),
+        'relax_centre_id_checks': (
+            PROCESS_WCMP2_ETS['inputs']['relax_centre_id_checks'])
+    },
+    'outputs': {
+        'result': {
+            'title': 'Summary of ETS results',
+            'description': 'Per-record summary of ETS results, and '
+                           'aggregate summary',
+            'schema': {
+                'type': 'object',
+                'contentMediaType': 'application/json'
+            }
+        }
+    },
+    'example': {
+        'inputs': {
+            'records': [EXAMPLE_WCMP2],
+            'fail_on_schema_validation': True,
+            'relax_centre_id_checks': False
+        }
+    }
+}
+
+
+PROCESS_WCMP2_KPI_BATCH = {
+    'version': get_package_version(),
+    'id': 'pywcmp-wis2-wcmp2-kpi-batch',
+    'title': {
+        'en': 'WCMP2 KPI batch evaluator'
+    },
+    'description': {
+        'en': 'Validate a batch of WCMP2 documents against the KPI suite'
+    },
+    'keywords': ['wis2', 'wcmp2', 'kpi', 'test suite', 'metadata', 'batch'],
+    'links': PROCESS_WCMP2_KPI['links'],
+    'jobControlOptions': ['sync-execute', 'async-execute'],
+    'inputs': {
+        'records': BATCH_RECORDS_INPUT,
+        'deadline': PROCESS_WCMP2_KPI['inputs']['deadline'],
+        'offline': PROCESS_WCMP2_KPI['inputs']['offline']
+    },
+    'outputs': {
+        'result': {
+            'title': 'Summary of KPI results',
+            'description': 'Per-record summary of KPI results, and '
+                           'aggregate summary',
+            'schema': {
+                'type': 'object',
+                'contentMediaType': 'application/json'
+            }
+        }
+    },
+    'example': {
+        'inputs': {
+            'records': [EXAMPLE_WCMP2]
+        }
+    }
+}
+
+
+def get_record(record) -> dict:
+    """
+    Helper function to derive a record from process input
+
+    :param record: `dict` of inline record or `str` of record link
+
+    :returns: `dict` of record
+    """
+
+    if isinstance(record, str) and record.startswith('http'):
+        LOGGER.debug('Record is a link')
+        return json.loads(fetch_record(record))
+
+    LOGGER.debug('Record is inline')
+
+    if not isinstance(record, dict):
+        raise ValueError('Record must be an object or link')
+
+    return record
+
+
+def get_fetch_executor() -> ThreadPoolExecutor:
+    """
+    Helper function to derive the thread pool fetching remote records of
+    batch processes
+
+    :returns: `concurrent.futures.ThreadPoolExecutor`
+    """
+
+    global _FETCH_EXECUTOR
+
+    # kept separate from the link check pool of KPI admission control, so
+    # that record fetches are bounded without bypassing admission control
+    with _FETCH_EXECUTOR_LOCK:
+        if _FETCH_EXECUTOR is None:
+            _FETCH_EXECUTOR = ThreadPoolExecutor(
+                max_workers=MAX_FETCH_WORKERS,
+                thread_name_prefix='pywcmp-fetch')
+
+        return _FETCH_EXECUTOR
+
+
+def get_records(records: list, executor: Executor = None) -> list:
+    """
+    Helper function to derive a batch of records from process input,
+    fetching remote records concurrently
+
+    :param records: `list` of inline records and/or record links
+    :param executor: optional `concurrent.futures.Executor` to fetch
+                     records with (default is the shared record fetch
+                     thread pool)
+
+    :returns: `list` of `tuple` of record (`dict`) and error (`str`),
+              in input order
+    """
+
+    def get_record_or_error(record) -> tuple:
+        try:
+            return get_record(record), None
+        except Exception as err:
+            LOGGER.debug(f'Cannot get record: {err}')
+            return None, str(err)
+
+    executor = executor or get_fetch_executor()
+
+    return list(executor.map(get_record_or_error, records))
+
+
+def get_batch_input(data: dict) -> list:
+    """
+    Helper function to validate batch process input
+
+    :param data: `dict` of process inputs
+
+    :returns: `list` of records input
+    """
+
+    records = data.get('records')
+
+    if not records or not isinstance(records, list):
+        msg = 'Missing records'
+        LOGGER.error(msg)
+        raise ProcessorExecuteError(msg)
+
+    return records
+
+
+def get_deadline(data: dict) -> Union[float, None]:
+    """
+    Helper function to validate the deadline process input
+
+    :param data: `dict` of process inputs
+
+    :returns: `float` of deadline, in seconds, or `None` if not set
+    """
+
+    deadline = data.get('deadline')
+
+    if deadline is None:
+        return None
+
+    if (isinstance(deadline, bool) or
+            not isinstance(deadline, (int, float)) or
+            not 0 < deadline < float('inf')):
+        msg = f'Invalid deadline {deadline!r}: must be a positive number'
+        LOGGER.error(msg)
+        raise ProcessorExecuteError(msg)
+
+    return float(deadline)
+
+
+def get_report_cache(processor_def: dict,
+                     ttl: Union[int, None] = None) -> ReportCache:
+    """
+    Helper function to derive a report cache from process configuration
+
+    :param processor_def: `dict` of processor definition
+    :param ttl: default time to live of a report, in seconds (`None` for
+                no expiry)
+
+    :returns: `pywcmp.cache.ReportCache`
+    """
+
+    config = processor_def.get('cache') or {}
+    key = json.dumps([config, ttl], sort_keys=True)
+
+    # processors are instantiated per request, so caches are kept at
+    # module level and shared by processors with the same configuration
+    with _REPORT_CACHES_LOCK:
+        if key not in _REPORT_CACHES:
+            _REPORT_CACHES[key] = ReportCache(
+                size=config.get('size', CACHE_SIZE),
+                ttl=config.get('ttl', ttl),
+                directory=config.get('dir'),
+                disk_size=config.get('disk_size'))
+
+        return _REPORT_CACHES[key]
+
+
+class AdmissionController:
+    """Admission control of KPI jobs"""
+
+    def __init__(self, max_jobs: int = MAX_KPI_JOBS,
+                 max_queue: int = MAX_KPI_QUEUE,
+                 queue_timeout: int = KPI_QUEUE_TIMEOUT,
+                 link_workers: int = MAX_LINK_WORKERS):
+        """
+        initializer
+
+        :param max_jobs: maximum number of concurrent jobs
+        :param max_queue: maximum number of jobs waiting to run
+        :param queue_timeout: maximum wait of a job, in seconds
+        :param link_workers: size of thread pool shared by jobs
+
+        :returns: `pywcmp.pygeoapi_plugin.AdmissionController`
+        """
+
+        self.max_jobs = max_jobs
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.evaluator = WMOCoreMetadataProfileKPIEvaluator(
+            max_workers=link_workers)
+        self.executor = self.evaluator.executor
+
+        self._slots = threading.BoundedSemaphore(max_jobs)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self):
+        """
+        Admit a job, waiting for a free slot if needed
+
+        :returns: `None` (context manager)
+        """
+
+        with self._lock:
+            if self._pending >= self.max_jobs + self.max_queue:
+                msg = 'Too many KPI jobs queued; try again later'
+                LOGGER.warning(msg)
+                raise ProcessorExecuteError(msg)
+            self._pending += 1
+
+        try:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                msg = 'Timed out waiting to run KPI job; try again later'
+                LOGGER.warning(msg)
+                raise ProcessorExecuteError(msg)
+
+            try:
+                yield
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+def get_admission_controller(processor_def: dict) -> AdmissionController:
+    """
+    Helper function to derive KPI admission control from process
+    configuration
+
+    :param processor_def: `dict` of processor definition
+
+    :returns: `pywcmp.pygeoapi_plugin.AdmissionController`
+    """
+
+    config = processor_def.get('admission') or {}
+    key = json.dumps(config, sort_keys=True)
+
+    with _ADMISSION_CONTROLLERS_LOCK:
+        if key not in _ADMISSION_CONTROLLERS:
+            _ADMISSION_CONTROLLERS[key] = AdmissionController(
+                max_jobs=config.get('max_jobs', MAX_KPI_JOBS),
+                max_queue=config.get('max_queue', MAX_KPI_QUEUE),
+                queue_timeout=config.get('queue_timeout', KPI_QUEUE_TIMEOUT),
+                link_workers=config.get('link_workers', MAX_LINK_WORKERS))
+
+        return _ADMISSION_CONTROLLERS[key]
+
+
+def get_report(cache: ReportCache, report_type: str, record: dict,
+               admission: AdmissionController = None, **options) -> dict:
+    """
+    Helper function to run the ETS or KPIs against a record, returning
+    a cached report if available
+
+    :param cache: `pywcmp.cache.ReportCache`
+    :param report_type: `str` of report type (`ets` or `kpi`)
+    :param record: `dict` of record
+    :param admission: optional `pywcmp.pygeoapi_plugin.AdmissionController`
+                      of KPI jobs
+    :param options: options of the ETS or KPI run
+
+    :returns: `dict` of report, with cache metadata
+    """
+
+    key = get_cache_key(record, report_type, **options)
+
+    entry = cache.get(key)
+    if entry is not None:
+        LOGGER.debug('Returning cached report')
+        return with_cache_metadata(*entry)
+
+    if report_type == 'ets':
+        LOGGER.debug('Running ETS against record')
+        ts = WMOCoreMetadataProfileTestSuite2(record)
+        report = ts.run_tests(**options)
+    else:
+        if options.get('offline', False):
+            # no network access, hence not subject to admission control
+            admission = None
+
+        with nullcontext() if admission is None else admission.admit():
+            LOGGER.debug('Running KPIs against record')
+            if admission is None:
+                kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(record)
+                report = kpis.evaluate(**options)
+            else:
+                report = admission.evaluator.evaluate(record, **options)
+
+    if not report['summary'].get('deadline_exceeded', False):
+        cache.put(key, report)
+
+    return with_cache_metadata(report, None)
+
+
+def warm_up() -> None:
+    """
+    Load bundle resources (schema validator, codelists, topic hierarchy)
+    and spellchecker once, so that requests do not pay for them.  Bundle
+    resources are kept across requests, and are reloaded when a new bundle
+    version is installed
+
+    :returns: `None`
+    """
+
+    try:
+        get_bundle_resources()
+    except Exception as err:
+        LOGGER.warning(f'Cannot load bundle resources: {err}')
+
+    get_spellchecker()
+
+
 class WCMP2ETSProcessor(BaseProcessor):
     """WCMP2 ETS"""
 
@@ -218,6 +702,10 @@ class WCMP2ETSProcessor(BaseProcessor):
 
         super().__init__(processor_def, PROCESS_WCMP2_ETS)
 
+        self.cache = get_report_cache(processor_def)
+
+        warm_up()
+
     def execute(self, data, outputs=None):
 
         response = None
@@ -231,14 +719,10 @@ class WCMP2ETSProcessor(BaseProcessor):
             LOGGER.error(msg)
             raise ProcessorExecuteError(msg)
 
-        if isinstance(record, str) and record.startswith('http'):
-            LOGGER.debug('Record is a link')
-            record = json.loads(urlopen_(record).read())
-        else:
-            LOGGER.debug('Record is inline')
+        record = get_record(record)
 
-        LOGGER.debug('Running ETS against record')
-        response = WMOCoreMetadataProfileTestSuite2(record).run_tests(
+        response = get_report(
+            self.cache, 'ets', record,
             fail_on_schema_validation=fail_on_schema_validation,
             relax_centre_id_checks=relax_centre_id_checks)
 
@@ -262,29 +746,192 @@ class WCMP2KPIProcessor(BaseProcessor):
 
         super().__init__(processor_def, PROCESS_WCMP2_KPI)
 
+        self.cache = get_report_cache(processor_def, KPI_CACHE_TTL)
+        self.admission = get_admission_controller(processor_def)
+
+        warm_up()
+
     def execute(self, data, outputs=None):
 
         response = None
         mimetype = 'application/json'
 
         record = data.get('record')
+        deadline = get_deadline(data)
 
         if record is None:
             msg = 'Missing record'
             LOGGER.error(msg)
             raise ProcessorExecuteError(msg)
 
-        if isinstance(record, str) and record.startswith('http'):
-            LOGGER.debug('Record is a link')
-            record = json.loads(urlopen_(record).read())
-        else:
-            LOGGER.debug('Record is inline')
+        record = get_record(record)
 
-        LOGGER.debug('Running KPIs against record')
-        kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(record)
-        response = kpis.evaluate()
+        response = get_report(self.cache, 'kpi', record, self.admission,
+                              deadline=deadline,
+                              offline=data.get('offline', False))
 
         return mimetype, response
 
     def __repr__(self):
         return '<WCMP2KPIProcessor>'
+
+
+class WCMP2ETSBatchProcessor(BaseProcessor):
+    """WCMP2 ETS (batch)"""
+
+    def __init__(self, processor_def):
+        """
+        Initialize object
+
+        :param processor_def: provider definition
+
+        :returns: pywcmp.pygeoapi_plugin.WCMP2ETSBatchProcessor
+        """
+
+        super().__init__(processor_def, PROCESS_WCMP2_ETS_BATCH)
+
+        self.cache = get_report_cache(processor_def)
+
+        warm_up()
+
+    def execute(self, data, outputs=None):
+
+        mimetype = 'application/json'
+        records = get_batch_input(data)
+        fail_on_schema_validation = data.get('fail_on_schema_validation', True)
+        relax_centre_id_checks = data.get('relax_centre_id_checks', False)
+
+        results = []
+        summary = {
+            'records': len(records),
+            'passed': 0,
+            'failed': 0,
+            'errors': 0
+        }
+
+        LOGGER.debug(f'Running ETS against {len(records)} records')
+        for count, (record, error) in enumerate(get_records(records)):
+            result = {
+                'record': count
+            }
+
+            if isinstance(records[count], str):
+                result['href'] = records[count]
+
+            if error is None:
+                try:
+                    result['metadata_id'] = record.get('id')
+                    report = get_report(
+                        self.cache, 'ets', record,
+                        fail_on_schema_validation=fail_on_schema_validation,
+                        relax_centre_id_checks=relax_centre_id_checks)
+                    result['cache'] = report['cache']
+                    result['summary'] = report['summary']
+                    result['failures'] = [{
+                        'id': test['id'],
+                        'message': test.get('message')
+                    } for test in report['tests'] if test['code'] == 'FAILED']
+                except Exception as err:
+                    error = str(err)
+
+            if error is not None:
+                result['error'] = error
+                summary['errors'] += 1
+            elif result['summary']['FAILED'] > 0:
+                summary['failed'] += 1
+            else:
+                summary['passed'] += 1
+
+            results.append(result)
+
+        return mimetype, {
+            'summary': summary,
+            'results': results
+        }
+
+    def __repr__(self):
+        return '<WCMP2ETSBatchProcessor>'
+
+
+class WCMP2KPIBatchProcessor(BaseProcessor):
+    """WCMP2 KPI (batch)"""
+
+    def __init__(self, processor_def):
+        """
+        Initialize object
+
+        :param processor_def: provider definition
+
+        :returns: pywcmp.pygeoapi_plugin.WCMP2KPIBatchProcessor
+        """
+
+        super().__init__(processor_def, PROCESS_WCMP2_KPI_BATCH)
+
+        self.cache = get_report_cache(processor_def, KPI_CACHE_TTL)
+        self.admission = get_admission_controller(processor_def)
+
+        warm_up()
+
+    def execute(self, data, outputs=None):
+
+        mimetype = 'application/json'
+        records = get_batch_input(data)
+        deadline = get_deadline(data)
+
+        results = []
+        percentages = []
+        summary = {
+            'records': len(records),
+            'evaluated': 0,
+            'errors': 0,
+            'percentage': None,
+            'grades': {}
+        }
+
+        LOGGER.debug(f'Running KPIs against {len(records)} records')
+        for count, (record, error) in enumerate(get_records(records)):
+            result = {
+                'record': count
+            }
+
+            if isinstance(records[count], str):
+                result['href'] = records[count]
+
+            if error is None:
+                try:
+                    result['metadata_id'] = record.get('id')
+                    report = get_report(
+                        self.cache, 'kpi', record, self.admission,
+                        deadline=deadline,
+                        offline=data.get('offline', False))
+                    result['cache'] = report['cache']
+                    result['summary'] = {
+                        k: report['summary'][k]
+                        for k in ['total', 'score', 'percentage', 'grade']
+                    }
+                except Exception as err:
+                    error = str(err)
+
+            if error is not None:
+                result['error'] = error
+                summary['errors'] += 1
+            else:
+                summary['evaluated'] += 1
+                grade = result['summary']['grade']
+                summary['grades'][grade] = summary['grades'].get(grade, 0) + 1
+                if result['summary']['percentage'] is not None:
+                    percentages.append(result['summary']['percentage'])
+
+            results.append(result)
+
+        if percentages:
+            summary['percentage'] = round(
+                sum(percentages) / len(percentages), ROUND)
+
+        return mimetype, {
+            'summary': summary,
+            'results': results
+        }
+
+    def __repr__(self):
+        return '<WCMP2KPIBatchProcessor>'
@@ -0,0 +1,173 @@
+###############################################################################
+#
+# Authors: Tom Kralidis <tomkralidis@gmail.com>
+#
+# Copyright (c) 2026 Tom Kralidis
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+# batch (NDJSON) reports, e.g. of shards of a catalogue
+
+import json
+import logging
+from pathlib import Path
+
+import click
+
+from pywcmp.util import get_cli_common_options, setup_logger
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_summaries(report: dict) -> tuple:
+    """
+    Helper function to derive the ETS and KPI summaries of a batch report
+    (full or summarized ETS, KPI or combined report of a record)
+
+    :param report: `dict` of batch report of a record
+
+    :returns: `tuple` of ETS summary and KPI summary (`None` if not
+              available)
+    """
+
+    if report.get('report_type') == 'ets':
+        return report['summary'], None
+    elif report.get('report_type') == 'kpi':
+        return None, report['summary']
+    elif 'ets' in report and 'kpi' in report:
+        ets_summary = report['ets'].get('summary', report['ets'])
+        kpi_summary = report['kpi'].get('summary', report['kpi'])
+        return ets_summary, kpi_summary
+    elif 'summary' in report:
+        return None, report['summary']
+
+    return None, None
+
+
+def merge_reports(paths: list) -> dict:
+    """
+    Merge batch reports (NDJSON, one report per record) into one summary,
+    e.g. of the shards of a catalogue.  Records reported more than once
+    (by record source) are counted once (last report wins)
+
+    :param paths: `list` of paths of NDJSON reports (optionally compressed)
+
+    :returns: `dict` of summary
+    """
+
+    from pywcmp.batch import open_stream
+    from pywcmp.wcmp2.kpi import ROUND
+
+    reports = {}
+
+    for path in paths:
+        LOGGER.debug(f'Reading {path}')
+        with open_stream(Path(path)) as fh:
+            for count, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                try:
+                    report = json.loads(line)
+                    reports[report['source']] = report
+                except (ValueError, KeyError, TypeError) as err:
+                    msg = f'Invalid report at {path}:{count}: {err}'
+                    LOGGER.error(msg)
+                    raise RuntimeError(msg)
+
+    ets = {
+        'evaluated': 0,
+        'passed': 0,
+        'failed': 0,
+        'tests': {code: 0 for code in
+                  ['PASSED', 'FAILED', 'SKIPPED', 'WARNING']}
+    }
+    kpi = {
+        'evaluated': 0,
+        'percentage': None,
+        'grades': {}
+    }
+    percentages = []
+
+    summary = {
+        'records': len(reports),
+        'errors': 0,
+        'ets': ets,
+        'kpi': kpi
+    }
+
+    for report in reports.values():
+        if 'error' in report:
+            summary['errors'] += 1
+            continue
+
+        ets_summary, kpi_summary = get_summaries(report)
+
+        if ets_summary is not None:
+            ets['evaluated'] += 1
+            if ets_summary.get('FAILED', 0) > 0:
+                ets['failed'] += 1
+            else:
+                ets['passed'] += 1
+            for code in ets['tests']:
+                ets['tests'][code] += ets_summary.get(code, 0)
+
+        if kpi_summary is not None:
+            kpi['evaluated'] += 1
+            grade = str(kpi_summary.get('grade'))
+            kpi['grades'][grade] = kpi['grades'].get(grade, 0) + 1
+            if kpi_summary.get('percentage') is not None:
+                percentages.append(kpi_summary['percentage'])
+
+    if percentages:
+        kpi['percentage'] = round(sum(percentages) / len(percentages), ROUND)
+
+    if ets['evaluated'] == 0:
+        summary.pop('ets')
+    if kpi['evaluated'] == 0:
+        summary.pop('kpi')
+
+    return summary
+
+
+@click.group()
+def report():
+    """batch reports"""
+    pass
+
+
+@click.command()
+@click.pass_context
+@get_cli_common_options
+@click.argument('reports', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+def merge(ctx, reports, logfile, verbosity):
+    """merge batch reports (e.g. of shards) into one summary"""
+
+    setup_logger(verbosity, logfile)
+
+    try:
+        summary = merge_reports(reports)
+    except (OSError, RuntimeError) as err:
+        raise click.ClickException(err)
+
+    click.echo(json.dumps(summary, indent=4))
+
+
+report.add_command(merge)
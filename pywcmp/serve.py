@@ -0,0 +1,355 @@
+###############################################################################
+#
+# Authors: Tom Kralidis <tomkralidis@gmail.com>
+#
+# Copyright (c) 2026 Tom Kralidis
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+# long-running validation service, keeping bundle resources and
+# spellchecker warm across requests
+#
+# POST /ets (query parameters: fail_on_schema_validation,
+#            relax_centre_id_checks)
+# POST /kpi (query parameters: kpi, fail_on_ets, offline, deadline)
+# GET /health
+#
+# with the WCMP2 record as request body
+
+import functools
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+from pathlib import Path
+import signal
+import socket
+import socketserver
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import click
+
+from pywcmp.util import (get_cli_common_options, get_spellchecker,
+                         MAX_RECORD_SIZE, parse_wcmp, setup_logger)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """
+    Load bundle resources and spellchecker, so that the first request
+    does not pay for them
+
+    :returns: `None`
+    """
+
+    from pywcmp.wcmp2.ets import get_bundle_resources
+
+    LOGGER.debug('Loading bundle resources (incl. schema validator)')
+    get_bundle_resources()
+
+    LOGGER.debug('Loading spellchecker')
+    get_spellchecker()
+
+    LOGGER.debug('Loading KPI evaluator')
+    get_kpi_evaluator()
+
+
+@functools.cache
+def get_kpi_evaluator():
+    """
+    Helper function to get the KPI evaluator of the service (with link
+    check thread pool shared by requests), created once per process
+
+    :returns: `pywcmp.wcmp2.kpi.WMOCoreMetadataProfileKPIEvaluator`
+    """
+
+    from pywcmp.wcmp2.kpi import WMOCoreMetadataProfileKPIEvaluator
+
+    return WMOCoreMetadataProfileKPIEvaluator()
+
+
+def run_ets(data: dict, fail_on_schema_validation: bool = True,
+            relax_centre_id_checks: bool = False) -> dict:
+    """
+    Run the ETS against a record
+
+    :param data: `dict` of WCMP2 record
+    :param fail_on_schema_validation: `bool` of whether to stop the ETS
+                                      on failing schema validation
+    :param relax_centre_id_checks: `bool` of whether to relax centre
+                                   identifier based checks
+
+    :returns: `dict` of ETS report
+    """
+
+    from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
+
+    ts = WMOCoreMetadataProfileTestSuite2(data)
+
+    return ts.run_tests(fail_on_schema_validation, relax_centre_id_checks)
+
+
+def run_kpi(data: dict, kpi: str = None, fail_on_ets: bool = True,
+            deadline: float = None, offline: bool = False) -> dict:
+    """
+    Run the KPIs against a record
+
+    :param data: `dict` of WCMP2 record
+    :param kpi: `str` of KPI to run (default is all)
+    :param fail_on_ets: `bool` of whether to stop on failing ETS
+    :param deadline: optional time budget of the evaluation, in seconds
+    :param offline: `bool` of whether to skip KPIs requiring network access
+
+    :returns: `dict` of KPI report
+    """
+
+    from pywcmp.wcmp2.ets import WMOCoreMetadataProfileTestSuite2
+
+    if fail_on_ets:
+        ts = WMOCoreMetadataProfileTestSuite2(data)
+        _ = ts.run_tests(fail_on_schema_validation=True)
+
+    return get_kpi_evaluator().evaluate(data, kpi, deadline, offline)
+
+
+class ValidationRequestHandler(BaseHTTPRequestHandler):
+    """HTTP request handler of the validation service"""
+
+    def do_GET(self):
+        from pywcmp.bundle import get_bundle_version
+
+        if urlparse(self.path).path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+            return
+
+        self._send_json(200, {
+            'status': 'ok',
+            'bundle_version': get_bundle_version()
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path not in ['/ets', '/kpi']:
+            self._send_json(404, {'error': 'Not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+
+        if not 0 < length <= MAX_RECORD_SIZE:
+            self._send_json(400, {'error': 'Invalid record size'})
+            return
+
+        try:
+            data = parse_wcmp(self.rfile.read(length))
+            if url.path == '/ets':
+                report = run_ets(
+                    data,
+                    _get_bool(params, 'fail_on_schema_validation', True),
+                    _get_bool(params, 'relax_centre_id_checks', False))
+            else:
+                deadline = params.get('deadline')
+                report = run_kpi(
+                    data, params.get('kpi'),
+                    _get_bool(params, 'fail_on_ets', True),
+                    None if deadline is None else float(deadline),
+                    _get_bool(params, 'offline', False))
+        except (RuntimeError, ValueError, KeyError, TypeError) as err:
+            LOGGER.debug(err)
+            self._send_json(400, {'error': str(err)})
+            return
+        except Exception as err:
+            LOGGER.error(err)
+            self._send_json(500, {'error': str(err)})
+            return
+
+        self._send_json(200, report)
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+
+        return 'unix'
+
+    def log_message(self, format, *args):
+        LOGGER.info(f'{self.address_string()} - {format % args}')
+
+    def _send_json(self, status: int, content: dict) -> None:
+        body = json.dumps(content).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if hasattr(socketserver, 'UnixStreamServer'):  # not on Windows
+    class UnixHTTPServer(socketserver.ThreadingMixIn,
+                         socketserver.UnixStreamServer):
+        """Threaded HTTP server on a Unix domain socket"""
+
+        daemon_threads = True
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP client connection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: int = None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request_report(server: str, report_type: str, content: bytes,
+                   timeout: int = 600, **params) -> dict:
+    """
+    Request a report from a running validation service (thin client)
+
+    :param server: `str` of service URL (`http://host:port` or
+                   `unix:///path/to/socket`)
+    :param report_type: `str` of report type (`ets` or `kpi`)
+    :param content: `bytes` of WCMP2 record
+    :param timeout: timeout, in seconds (default: 600)
+    :param params: request options
+
+    :returns: `dict` of report
+    """
+
+    url = urlparse(server)
+    query = urlencode({k: str(v).lower() if isinstance(v, bool) else v
+                       for k, v in params.items() if v is not None})
+
+    if url.scheme == 'unix':
+        conn = UnixHTTPConnection(url.path, timeout=timeout)
+    elif url.scheme == 'http':
+        conn = http.client.HTTPConnection(url.netloc, timeout=timeout)
+    else:
+        raise ValueError(f'Unsupported server URL {server}')
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    try:
+        conn.request('POST', f'/{report_type}?{query}', body=content,
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        result = json.loads(response.read())
+    except (OSError, http.client.HTTPException) as err:
+        raise RuntimeError(f'Cannot connect to {server}: {err}')
+    finally:
+        conn.close()
+
+    if response.status != 200:
+        raise RuntimeError(result.get('error', response.reason))
+
+    return result
+
+
+def _get_bool(params: dict, name: str, default: bool) -> bool:
+    """
+    Helper function to derive a boolean request option
+
+    :param params: `dict` of request options
+    :param name: `str` of option name
+    :param default: `bool` of default value
+
+    :returns: `bool` of option value
+    """
+
+    value = params.get(name)
+
+    if value is None:
+        return default
+
+    return value.lower() in ['true', '1', 'yes']
+
+
+@click.command()
+@click.pass_context
+@get_cli_common_options
+@click.option('--host', default='127.0.0.1',
+              help='Host to listen on (default: 127.0.0.1)')
+@click.option('--port', '-p', default=8080, type=int,
+              help='Port to listen on (default: 8080)')
+@click.option('--socket', '-s', 'socket_path',
+              type=click.Path(dir_okay=False),
+              help='Unix socket to listen on (instead of host/port)')
+@click.option('--workers', '-w', default=1, type=click.IntRange(min=1),
+              help='Number of pre-forked worker processes (default: 1)')
+def serve(ctx, logfile, verbosity, host, port, socket_path=None, workers=1):
+    """run validation service"""
+
+    setup_logger(verbosity, logfile)
+
+    if workers > 1 and not hasattr(os, 'fork'):
+        raise click.UsageError('--workers requires os.fork(), which is not '
+                               'available on this platform')
+
+    if socket_path is not None and not hasattr(socket, 'AF_UNIX'):
+        raise click.UsageError('--socket requires Unix domain sockets, '
+                               'which are not available on this platform')
+
+    try:
+        warm_up()
+    except RuntimeError as err:
+        raise click.ClickException(err)
+
+    if socket_path is not None:
+        Path(socket_path).unlink(missing_ok=True)
+        server = UnixHTTPServer(socket_path, ValidationRequestHandler)
+        click.echo(f'Listening on unix://{socket_path}')
+    else:
+        server = ThreadingHTTPServer((host, port), ValidationRequestHandler)
+        click.echo(f'Listening on http://{host}:{port}')
+
+    children = []
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        LOGGER.debug('Shutting down')
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        server.server_close()
+        if socket_path is not None:
+            Path(socket_path).unlink(missing_ok=True)
@@ -27,15 +27,27 @@
 #
 ###############################################################################
 
+import calendar
+from collections import OrderedDict
 from datetime import datetime, timezone
+import functools
+import hashlib
+from html.parser import HTMLParser
+import http.client
 import importlib.metadata
 import json
 import logging
+import os
 from pathlib import Path
+import re
+import socket
 import ssl
 import sys
-from urllib.error import URLError
-from urllib.request import urlopen
+import threading
+import time
+from typing import Union
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
 from urllib.parse import urlparse
 
 from spellchecker import SpellChecker
@@ -43,6 +55,28 @@ from spellchecker import SpellChecker
 LOGGER = logging.getLogger(__name__)
 THISDIR = Path(__file__).parent.resolve()
 
+# record fetching: connect timeout and time allowed to read the response
+# (in seconds), and maximum size of a record (in bytes)
+RECORD_CONNECT_TIMEOUT = 10
+RECORD_READ_TIMEOUT = 30
+MAX_RECORD_SIZE = 10 * 1024 * 1024
+
+# conditional GET cache of fetched records: maximum number of records,
+# and maximum size of a cached record (in bytes)
+RECORD_CACHE_SIZE = 32
+RECORD_CACHE_MAX_RECORD_SIZE = 1024 * 1024
+
+# accepted RFC3339 datetimes: YYYY-MM-DDTHH:MM:SS, followed by Z (with
+# optional fractional seconds) or a numeric offset
+RFC3339_REGEX = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})[Tt](\d{2}):(\d{2}):(\d{2})'
+    r'(?:(?:\.\d{1,6})?[Zz]|[+-](\d{2}):?(\d{2}))\Z')
+
+_USERDIR = None
+
+_RECORD_CACHE = OrderedDict()
+_RECORD_CACHE_LOCK = threading.Lock()
+
 
 def check_spelling(text: str) -> list:
     """
@@ -52,13 +86,67 @@ def check_spelling(text: str) -> list:
     """
 
     LOGGER.debug(f'Spellchecking {text}')
+    spell = get_spellchecker()
+
+    return list(spell.unknown(spell.split_words(text)))
+
+
+@functools.cache
+def get_spellchecker() -> SpellChecker:
+    """
+    Helper function to get a spellchecker (with custom dictionary), loaded
+    once per process
+
+    :returns: `spellchecker.SpellChecker`
+    """
+
     spell = SpellChecker()
 
     dictionary = THISDIR / 'resources' / 'dictionary.txt'
     LOGGER.debug(f'Loading custom dictionary {dictionary}')
     spell.word_frequency.load_text_file(f'{dictionary}')
 
-    return list(spell.unknown(spell.split_words(text)))
+    return spell
+
+
+class _MarkupFound(Exception):
+    """Raised by the tag detector on the first tag found"""
+
+    pass
+
+
+class _TagDetector(HTMLParser):
+    """HTML parser stopping at the first (start or self-closing) tag"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+
+    def handle_starttag(self, tag, attrs):
+        raise _MarkupFound()
+
+
+def has_markup(text: str) -> bool:
+    """
+    Helper function to detect markup (i.e. any HTML/XML tag) in a string,
+    stopping at the first tag found
+
+    :param text: `str` of text
+
+    :returns: `bool` of whether text contains markup
+    """
+
+    if '<' not in text:
+        return False
+
+    parser = _TagDetector()
+
+    try:
+        parser.feed(text)
+        parser.close()
+    except _MarkupFound:
+        return True
+
+    return False
 
 
 def get_cli_common_options(function):
@@ -87,16 +175,48 @@ def get_package_version() -> str:
     return importlib.metadata.version('pywcmp')
 
 
-def get_userdir() -> str:
+def get_userdir() -> Path:
     """
-    Helper function to get userdir
+    Helper function to get userdir (bundle location)
+
+    The bundle location is, in order of precedence, the directory set
+    with `set_userdir`, the `PYWCMP_BUNDLE_DIR` environment variable,
+    or `~/.pywcmp`
 
-    :returns: user's home directory
+    :returns: `Path` of bundle location
     """
 
+    if _USERDIR is not None:
+        return _USERDIR
+
+    userdir = os.environ.get('PYWCMP_BUNDLE_DIR')
+
+    if userdir:
+        return Path(userdir).expanduser()
+
     return Path.home() / '.pywcmp'
 
 
+def set_userdir(userdir: Union[Path, str, None]) -> None:
+    """
+    Helper function to set userdir (bundle location) for the current
+    process, e.g. a shared, read-only system-wide bundle
+
+    :param userdir: `Path` of bundle location, or `None` to reset
+
+    :returns: `None`
+    """
+
+    global _USERDIR
+
+    if userdir is None:
+        _USERDIR = None
+    else:
+        _USERDIR = Path(userdir).expanduser()
+
+    LOGGER.debug(f'Bundle location set to {get_userdir()}')
+
+
 def setup_logger(loglevel: str = None, logfile: str = None) -> None:
     """
     Setup logging
@@ -137,63 +257,198 @@ def setup_logger(loglevel: str = None, logfile: str = None) -> None:
         LOGGER.debug('Logging initialized')
 
 
-def urlopen_(url: str):
+def urlopen_(url: Union[str, Request], timeout: int = None,
+             allow_unverified: bool = False):
     """
     Helper function for downloading a URL
 
-    :param url: URL to download
+    :param url: URL (or `urllib.request.Request`) to download
+    :param timeout: timeout, in seconds (default: no timeout)
+    :param allow_unverified: `bool` of whether to retry without SSL/TLS
+                             verification if certificate verification
+                             failed (default: `False`)
 
     :returns: `http.client.HTTPResponse`
     """
 
+    kwargs = {} if timeout is None else {'timeout': timeout}
+
     try:
-        response = urlopen(url)
-    except (ssl.SSLError, URLError) as err:
+        response = urlopen(url, **kwargs)
+    except (ssl.SSLCertVerificationError, URLError) as err:
+        if not allow_unverified or not is_ssl_verification_error(err):
+            raise
+
+        full_url = getattr(url, 'full_url', url)
         LOGGER.warning(err)
-        LOGGER.warning(f'Creating unverified context for "{url}"')
+        LOGGER.warning(f'Creating unverified context for "{full_url}"')
         context = ssl._create_unverified_context()
 
-        response = urlopen(url, context=context)
+        response = urlopen(url, context=context, **kwargs)
 
     return response
 
 
+def fetch_record(url: str, connect_timeout: int = RECORD_CONNECT_TIMEOUT,
+                 read_timeout: int = RECORD_READ_TIMEOUT,
+                 max_size: int = MAX_RECORD_SIZE,
+                 allow_unverified: bool = False) -> bytes:
+    """
+    Helper function for downloading a (remote) record, with timeouts and
+    size limit.  Records are revalidated with conditional GET
+    (ETag/Last-Modified) when fetched repeatedly.  Fetching fails if the
+    SSL/TLS certificate cannot be verified, unless explicitly allowed
+
+    :param url: URL of record
+    :param connect_timeout: connect timeout, in seconds
+    :param read_timeout: time allowed to read the response, in seconds
+    :param max_size: maximum size of record, in bytes
+    :param allow_unverified: `bool` of whether to retry without SSL/TLS
+                             verification if certificate verification
+                             failed (default: `False`)
+
+    :returns: `bytes` of record
+    """
+
+    headers = {}
+
+    with _RECORD_CACHE_LOCK:
+        cached = _RECORD_CACHE.get(url)
+
+    if cached is not None:
+        if cached['etag'] is not None:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last-modified'] is not None:
+            headers['If-Modified-Since'] = cached['last-modified']
+
+    try:
+        response = urlopen_(Request(url, headers=headers),
+                            timeout=connect_timeout,
+                            allow_unverified=allow_unverified)
+    except HTTPError as err:
+        if err.code == 304 and cached is not None:
+            LOGGER.debug(f'Record not modified: {url}')
+            with _RECORD_CACHE_LOCK:
+                if url in _RECORD_CACHE:
+                    _RECORD_CACHE.move_to_end(url)
+            return cached['content']
+        raise RuntimeError(f'Cannot fetch record {url}: {err}')
+    except (OSError, ValueError) as err:
+        raise RuntimeError(f'Cannot fetch record {url}: {err}')
+
+    with response:
+        content_length = response.headers.get('Content-Length')
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > max_size:
+                msg = f'Record {url} exceeds maximum size ({max_size} bytes)'
+                raise RuntimeError(msg)
+
+        chunks = []
+        size = 0
+        deadline = time.monotonic() + read_timeout
+
+        timeout_msg = f'Timed out reading record {url} ({read_timeout}s)'
+
+        # the socket timeout is shrunk to the time left before each read,
+        # and read1 returns whatever is available, so that a slowly
+        # trickling response cannot hold the read beyond the deadline
+        sock = getattr(getattr(response.fp, 'raw', None), '_sock', None)
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(timeout_msg)
+
+                if sock is not None:
+                    sock.settimeout(remaining)
+
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_size:
+                    msg = f'Record {url} exceeds maximum size ({max_size} bytes)'  # noqa
+                    raise RuntimeError(msg)
+
+                chunks.append(chunk)
+        except TimeoutError:
+            raise RuntimeError(timeout_msg)
+        except OSError as err:
+            raise RuntimeError(f'Cannot fetch record {url}: {err}')
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+    content = b''.join(chunks)
+
+    if ((etag is not None or last_modified is not None) and
+            size <= RECORD_CACHE_MAX_RECORD_SIZE):
+        with _RECORD_CACHE_LOCK:
+            _RECORD_CACHE[url] = {
+                'etag': etag,
+                'last-modified': last_modified,
+                'content': content
+            }
+            _RECORD_CACHE.move_to_end(url)
+            while len(_RECORD_CACHE) > RECORD_CACHE_SIZE:
+                _RECORD_CACHE.popitem(last=False)
+
+    return content
+
+
 def check_url(url: str, check_ssl: bool, timeout: int = 30) -> dict:
     """
-    Helper function to check link (URL) accessibility
+    Helper function to check link (URL) accessibility.  When SSL/TLS
+    verification fails, the link is checked again without verification,
+    within the same deadline
 
     :param url: The URL to check
     :param check_ssl: Whether the SSL/TLS layer verification shall be made
-    :param timeout: timeout, in seconds (default: 30)
+    :param timeout: total deadline of the check, in seconds (default: 30)
 
-    :returns: `dict` with details about the link
+    :returns: `dict` with details about the link (failure class in
+              `error`, one of `timeout`, `dns`, `tls`, `http`,
+              `connection` or `invalid`)
     """
 
     response = None
+    error = None
     result = {
         'mime-type': None,
         'url-original': url
     }
 
-    try:
-        if not check_ssl:
-            LOGGER.debug(f'Creating unverified context for "{url}"')
-            result['ssl'] = False
-            context = ssl._create_unverified_context()
-            response = urlopen(url, context=context, timeout=timeout)
-        else:
-            response = urlopen(url, timeout=timeout)
-    except TimeoutError as err:
-        LOGGER.debug(f'Timeout error: {err} at "{url}"')
-    except (ssl.SSLError, URLError, ValueError) as err:
-        LOGGER.debug(f'SSL/URL error: {err} at "{url}"')
-        LOGGER.debug(err)
-    except Exception as err:
-        LOGGER.debug(f'Other error: {err} at "{url}"')
-        LOGGER.debug(err)
-
-    if response is None and check_ssl:
-        return check_url(url, False)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            error = 'timeout'
+            break
+
+        try:
+            if not check_ssl:
+                LOGGER.debug(f'Creating unverified context for "{url}"')
+                result['ssl'] = False
+                context = ssl._create_unverified_context()
+                response = urlopen(url, context=context, timeout=remaining)
+            else:
+                response = urlopen(url, timeout=remaining)
+            error = None
+        except Exception as err:
+            error = classify_url_error(err)
+            LOGGER.debug(f'{error} error: {err} at "{url}"')
+            if isinstance(err, HTTPError):
+                result['status'] = err.code
+            if check_ssl and is_ssl_verification_error(err):
+                # only an unverified request can succeed where
+                # verification failed
+                check_ssl = False
+                continue
+
+        break
 
     if response is not None:
         result['url-resolved'] = response.url
@@ -201,17 +456,66 @@ def check_url(url: str, check_ssl: bool, timeout: int = 30) -> dict:
         if parsed_uri.scheme in ('http', 'https'):
             if response.status > 300:
                 LOGGER.debug(f'Request failed at "{url}": {response}')
+                error = 'http'
+            result['status'] = response.status
             result['accessible'] = response.status < 300
             result['mime-type'] = response.headers.get_content_type()
         else:
             result['accessible'] = True
         if parsed_uri.scheme in ('https') and check_ssl:
             result['ssl'] = True
+        response.close()
     else:
         result['accessible'] = False
+
+    if not result['accessible']:
+        result['error'] = error
+
     return result
 
 
+def classify_url_error(err: Exception) -> str:
+    """
+    Helper function to classify a URL access error
+
+    :param err: `Exception` raised when accessing a URL
+
+    :returns: `str` of failure class (`timeout`, `dns`, `tls`, `http`,
+              `connection` or `invalid`)
+    """
+
+    if isinstance(err, HTTPError):
+        return 'http'
+
+    reason = getattr(err, 'reason', err) if isinstance(err, URLError) else err
+
+    if isinstance(reason, (TimeoutError, socket.timeout)):
+        return 'timeout'
+    if isinstance(reason, socket.gaierror):
+        return 'dns'
+    if isinstance(reason, ssl.SSLError):
+        return 'tls'
+    if isinstance(reason, (OSError, http.client.HTTPException)):
+        return 'connection'
+
+    return 'invalid'
+
+
+def is_ssl_verification_error(err: Exception) -> bool:
+    """
+    Helper function to test whether a URL access error is a failed
+    SSL/TLS certificate verification
+
+    :param err: `Exception` raised when accessing a URL
+
+    :returns: `bool` of whether certificate verification failed
+    """
+
+    reason = getattr(err, 'reason', err) if isinstance(err, URLError) else err
+
+    return isinstance(reason, ssl.SSLCertVerificationError)
+
+
 def parse_wcmp(content: str) -> dict:
     """
     Parse a string of WCMP into a JSON dict (WCMP2)
@@ -231,6 +535,22 @@ def parse_wcmp(content: str) -> dict:
     return data
 
 
+def get_record_hash(record: dict) -> str:
+    """
+    Helper function to derive a hash of a record, independent of key order
+    and formatting
+
+    :param record: `dict` of record
+
+    :returns: `str` of SHA-256 hex digest of canonical JSON of the record
+    """
+
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'),
+                           ensure_ascii=False)
+
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
 def get_current_datetime_rfc3339() -> str:
     """
     Gets the current datetime in RFC3339 format
@@ -244,24 +564,28 @@ def get_current_datetime_rfc3339() -> str:
 def is_valid_created_datetime(value: str) -> bool:
     """
     Helper function to test for accepted RFC3339 strings
+    (e.g. 2024-08-09T14:29:23Z, 2024-08-09T14:29:23.12Z,
+    2024-08-09T14:29:23+04:00)
 
     :param value: `str` of datetime
 
     :returns: `bool` of whether datetime is valid/acceptable
     """
 
-    datetime_formats = [
-        '%Y-%m-%dT%H:%M:%SZ',     # 2024-08-09T14:29:23Z
-        '%Y-%m-%dT%H:%M:%S.%fZ',  # 2024-08-09T14:29:23.12Z
-        '%Y-%m-%dT%H:%M:%S%z'     # 2024-08-09T14:29+0400
-    ]
+    match = RFC3339_REGEX.match(value) if isinstance(value, str) else None
 
-    for datetime_format in datetime_formats:
-        try:
-            datetime.strptime(value, datetime_format)
-            return True
-        except ValueError as err:
-            msg = f'datetime {value} invalid against {datetime_format}: {err}'
-            LOGGER.debug(msg)
+    if match is None:
+        LOGGER.debug(f'datetime {value} is not RFC3339')
+        return False
 
-    return False
+    year, month, day, hour, minute, second, tzhour, tzminute = (
+        int(v) if v is not None else 0 for v in match.groups())
+
+    if not (year >= 1 and 1 <= month <= 12 and
+            1 <= day <= calendar.monthrange(year, month)[1] and
+            hour <= 23 and minute <= 59 and second <= 59 and
+            tzhour <= 23 and tzminute <= 59):
+        LOGGER.debug(f'datetime {value} out of range')
+        return False
+
+    return True
@@ -0,0 +1,174 @@
+###############################################################################
+#
+# Authors: Tom Kralidis <tomkralidis@gmail.com>
+#
+# Copyright (c) 2026 Tom Kralidis
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+# combined validation (ETS and KPIs) of WCMP2, in a single pass
+
+import json
+import logging
+
+import click
+
+from pywcmp.batch import (check_batch_options, get_batch_options,
+                          is_batch_input, run_batch)
+from pywcmp.util import (fetch_record, get_cli_common_options, parse_wcmp,
+                         setup_logger)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def validate_record(data: dict, fail_on_ets: bool = True,
+                    relax_centre_id_checks: bool = False, kpi: str = None,
+                    deadline: float = None, offline: bool = False,
+                    validator=None, evaluator=None) -> dict:
+    """
+    Run the ETS and KPIs against a (parsed) record
+
+    :param data: `dict` of WCMP2 record
+    :param fail_on_ets: `bool` of whether to stop on failing schema
+                        validation (no report is generated)
+    :param relax_centre_id_checks: `bool` of whether to relax centre
+                                   identifier based checks
+    :param kpi: `str` of KPI to run (default is all)
+    :param deadline: optional time budget of the KPI evaluation, in seconds
+    :param offline: `bool` of whether to skip KPIs requiring network access
+    :param validator: optional
+                      `pywcmp.wcmp2.ets.WMOCoreMetadataProfileValidator2`
+                      (e.g. shared across records)
+    :param evaluator: optional
+                      `pywcmp.wcmp2.kpi.WMOCoreMetadataProfileKPIEvaluator`
+                      (e.g. shared across records)
+
+    :returns: `dict` of combined report (ETS and KPI reports)
+    """
+
+    from pywcmp.wcmp2.ets import WMOCoreMetadataProfileValidator2
+    from pywcmp.wcmp2.kpi import \
+        WMOCoreMetadataProfileKeyPerformanceIndicators
+
+    if validator is None:
+        validator = WMOCoreMetadataProfileValidator2()
+
+    LOGGER.debug('Running ETS against record')
+    ets_report = validator.validate(
+        data, fail_on_schema_validation=fail_on_ets,
+        relax_centre_id_checks=relax_centre_id_checks)
+
+    LOGGER.debug('Running KPIs against record')
+    if evaluator is None:
+        kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(data)
+        kpi_report = kpis.evaluate(kpi, deadline, offline)
+    else:
+        kpi_report = evaluator.evaluate(data, kpi, deadline, offline)
+
+    return {
+        'metadata_id': ets_report['metadata_id'],
+        'ets': ets_report,
+        'kpi': kpi_report
+    }
+
+
+def summarize_report(report: dict) -> dict:
+    """
+    Helper function to summarize a combined report
+
+    :param report: `dict` of combined report
+
+    :returns: `dict` of ETS and KPI summaries
+    """
+
+    return {
+        'metadata_id': report['metadata_id'],
+        'ets': report['ets']['summary'],
+        'kpi': report['kpi']['summary']
+    }
+
+
+@click.command()
+@click.pass_context
+@get_cli_common_options
+@click.argument('file_or_url')
+@click.option('--fail-on-ets/--no-fail-on-ets',
+              '-f', default=True,
+              help='Stop on failing schema validation')
+@click.option('--relax-centre-id-checks', '-r', is_flag=True,
+              default=False, help='Relax centre identifier based checks')
+@click.option('--summary', '-s', is_flag=True, default=False,
+              help='Provide summary of ETS and KPI results')
+@click.option('--kpi', '-k', help='KPI to run, default is all')
+@click.option('--offline', '-o', is_flag=True, default=False,
+              help='Skip KPIs requiring network access')
+@click.option('--deadline', '-d', type=click.FloatRange(min=0),
+              help='Time budget of the KPI evaluation, in seconds (links '
+                   'not checked in time are reported as not evaluated)')
+@get_batch_options
+def validate(ctx, file_or_url, logfile, verbosity, fail_on_ets=True,
+             relax_centre_id_checks=False, summary=False, kpi=None,
+             offline=False, deadline=None, workers=1, shard=None,
+             output=None, resume=False):
+    """validate against the ETS and KPIs"""
+
+    setup_logger(verbosity, logfile)
+
+    if is_batch_input(file_or_url) and not file_or_url.startswith('http'):
+        try:
+            failed = run_batch(
+                file_or_url, 'validate', workers, shard=shard,
+                output=output, resume=resume,
+                summarize=summarize_report if summary else None,
+                fail_on_ets=fail_on_ets,
+                relax_centre_id_checks=relax_centre_id_checks, kpi=kpi,
+                deadline=deadline, offline=offline)
+        except ValueError as err:
+            raise click.UsageError(err)
+        except RuntimeError as err:
+            raise click.ClickException(err)
+        ctx.exit(1 if failed else 0)
+
+    check_batch_options(shard, output, resume)
+
+    if file_or_url.startswith('http'):
+        try:
+            content = fetch_record(file_or_url)
+        except RuntimeError as err:
+            raise click.ClickException(err)
+    else:
+        with open(file_or_url) as fh:
+            content = fh.read()
+
+    click.echo(f'Validating {file_or_url}')
+
+    try:
+        data = parse_wcmp(content)
+        report = validate_record(data, fail_on_ets, relax_centre_id_checks,
+                                 kpi, deadline, offline)
+    except Exception as err:
+        raise click.ClickException(err)
+
+    if summary:
+        click.echo(json.dumps(summarize_report(report), indent=4))
+    else:
+        click.echo(json.dumps(report, indent=4))
+
+    ctx.exit(report['ets']['summary']['FAILED'])
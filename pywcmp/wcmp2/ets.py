@@ -26,13 +26,17 @@
 # executable test suite as per WMO Core Metadata Profile 2, Annex A
 
 import csv
+import functools
 import json
 import logging
 from pathlib import Path
 import re
+import threading
+from typing import Union
 import uuid
 
 from jsonschema import FormatChecker
+from jsonschema.exceptions import FormatError
 from jsonschema.validators import Draft202012Validator
 from shapely.geometry import shape
 from shapely.validation import explain_validity
@@ -41,11 +45,46 @@ from pywis_topics.topics import TopicHierarchy
 
 import pywcmp
 from pywcmp.errors import TestSuiteError
-from pywcmp.bundle import WCMP2_FILES
-from pywcmp.util import get_current_datetime_rfc3339, get_userdir
+from pywcmp.bundle import (diff_bundle_manifests, get_bundle_dir,
+                           get_bundle_dir_version, get_bundle_manifest)
+from pywcmp.util import get_current_datetime_rfc3339, get_record_hash
+from pywcmp.wcmp2.topics import CompiledTopicHierarchy
 
 LOGGER = logging.getLogger(__name__)
 
+FORMAT_CHECKERS = ['date-time', 'email', 'regex', 'uri', 'uri-reference']
+
+# maximum number of format verdicts kept
+FORMAT_CACHE_SIZE = 16384
+
+WIS2_TOPIC_HIERARCHY_TABLES = [
+    f'wis2-topic-hierarchy/{level}.csv' for level in [
+        'channel', 'version', 'system', 'centre-id', 'notification-type',
+        'data-policy', 'earth-system-discipline'
+    ]
+]
+
+# bundle artifacts that each test depends on, used to re-run only the
+# tests affected by a bundle update
+TEST_DEPENDENCIES = {
+    'test_requirement_validation': ['wcmp-2/wcmp2-bundled.json'],
+    'test_requirement_identifier': ['wis2-topic-hierarchy/centre-id.csv'],
+    'test_requirement_type': ['wcmp-2/codelists/resource-type.csv'],
+    'test_requirement_themes': [
+        'wis2-topic-hierarchy/earth-system-discipline.csv'
+    ],
+    'test_requirement_contacts': ['wcmp-2/codelists/contact-role.csv'],
+    'test_requirement_data_policy': ['wis2-topic-hierarchy/data-policy.csv'],
+    'test_requirement_links': [
+        'wcmp-2/link-relations-1.csv',
+        'wcmp-2/codelists/link-type.csv',
+        *WIS2_TOPIC_HIERARCHY_TABLES
+    ]
+}
+
+_BUNDLE_RESOURCES = None
+_BUNDLE_RESOURCES_LOCK = threading.Lock()
+
 
 def gen_test_id(test_id: str) -> str:
     """
@@ -62,11 +101,13 @@ def gen_test_id(test_id: str) -> str:
 class WMOCoreMetadataProfileTestSuite2:
     """Test suite for WMO Core Metadata Profile assertions"""
 
-    def __init__(self, data: dict):
+    def __init__(self, data: dict, resources: dict = None):
         """
         initializer
 
         :param data: dict of WCMP2 JSON
+        :param resources: optional `dict` of bundle resources (default is
+                          the resources of the active bundle)
 
         :returns: `pywcmp.wcmp2.ets.WMOCoreMetadataProfileTestSuite2`
         """
@@ -76,17 +117,38 @@ class WMOCoreMetadataProfileTestSuite2:
         self.errors = []
         self.relax_centre_id_checks = False
 
-        self.th = TopicHierarchy(tables=get_userdir())
+        self.resources = resources or get_bundle_resources()
+        self.th = self.resources['topic_hierarchy']
+        self.topics = self.resources['topics']
 
     def run_tests(self, fail_on_schema_validation=False,
-                  relax_centre_id_checks=False):
-        """Convenience function to run all tests"""
+                  relax_centre_id_checks=False, previous_report=None):
+        """
+        Convenience function to run all tests
+
+        :param fail_on_schema_validation: `bool` of whether to stop the ETS
+                                          on failing schema validation
+        :param relax_centre_id_checks: `bool` of whether to relax centre
+                                       identifier based checks
+        :param previous_report: `dict` of a previous ETS report of the same
+                                record.  If set and run with the same
+                                options, only tests depending on bundle
+                                artifacts changed since are run, and the
+                                results of the other tests are reused
+
+        :returns: `dict` of ETS report
+        """
 
         results = []
         tests = []
 
         self.relax_centre_id_checks = relax_centre_id_checks
 
+        options = {
+            'fail_on_schema_validation': fail_on_schema_validation,
+            'relax_centre_id_checks': relax_centre_id_checks
+        }
+
         ets_report = {
             'id': str(uuid.uuid4()),
             'report_type': 'ets',
@@ -102,16 +164,30 @@ class WMOCoreMetadataProfileTestSuite2:
 
                 tests.append(f)
 
-        validation_result = self.test_requirement_validation()
-        if validation_result['code'] == 'FAILED':
-            if fail_on_schema_validation:
-                msg = ('Record fails WCMP2 validation. Stopping ETS ',
-                       f"errors: {validation_result['errors']}")
-                LOGGER.error(msg)
-                raise ValueError(msg)
+        record_hash = get_record_hash(self.record)
+        artifacts = self.get_bundle_artifacts()
+
+        reusable_results = {}
+        if previous_report is not None:
+            reusable_results = self._get_reusable_results(
+                previous_report, tests, ets_report['generated_by'],
+                record_hash, artifacts, options)
+
+        if 'test_requirement_validation' not in reusable_results:
+            validation_result = self.test_requirement_validation()
+            if validation_result['code'] == 'FAILED':
+                if fail_on_schema_validation:
+                    msg = ('Record fails WCMP2 validation. Stopping ETS ',
+                           f"errors: {validation_result['errors']}")
+                    LOGGER.error(msg)
+                    raise ValueError(msg)
 
         for t in tests:
-            result = getattr(self, t)()
+            if t in reusable_results:
+                LOGGER.debug(f'Reusing previous result of {t}')
+                result = reusable_results[t]
+            else:
+                result = getattr(self, t)()
             results.append(result)
             if result['code'] == 'FAILED':
                 self.errors.append(result)
@@ -123,9 +199,69 @@ class WMOCoreMetadataProfileTestSuite2:
         ets_report['tests'] = results
         ets_report['datetime'] = get_current_datetime_rfc3339()
         ets_report['metadata_id'] = self.record['id']
+        ets_report['record_hash'] = record_hash
+        ets_report['options'] = options
+        ets_report['bundle'] = {
+            'version': self.resources['version'],
+            'artifacts': artifacts
+        }
 
         return ets_report
 
+    def get_bundle_artifacts(self) -> dict:
+        """
+        Get the digests of the bundle artifacts that the tests depend on
+
+        :returns: `dict` of artifact (relative path) to digest
+        """
+
+        manifest = self.resources['manifest']
+        artifacts = set()
+
+        for dependencies in TEST_DEPENDENCIES.values():
+            artifacts.update(dependencies)
+
+        return {a: manifest.get(a) for a in sorted(artifacts)}
+
+    def _get_reusable_results(self, report: dict, tests: list,
+                              generated_by: str, record_hash: str,
+                              artifacts: dict, options: dict) -> dict:
+        """
+        Helper function to derive the results of a previous report which
+        are not affected by bundle changes
+
+        :param report: `dict` of previous ETS report
+        :param tests: `list` of test names, in report order
+        :param generated_by: `str` of current report generator
+        :param record_hash: `str` of current record hash
+        :param artifacts: `dict` of current bundle artifact digests
+        :param options: `dict` of current ETS options
+
+        :returns: `dict` of test name to reusable result
+        """
+
+        previous_artifacts = report.get('bundle', {}).get('artifacts')
+
+        if any([previous_artifacts is None,
+                report.get('generated_by') != generated_by,
+                report.get('record_hash') != record_hash,
+                report.get('options') != options,
+                len(report.get('tests', [])) != len(tests)]):
+            LOGGER.debug('Previous report cannot be reused, running all tests')
+            return {}
+
+        changed = diff_bundle_manifests(previous_artifacts, artifacts)
+        LOGGER.debug(f'Bundle artifacts changed since previous report: {changed}')  # noqa
+
+        reusable_results = {}
+
+        for t, result in zip(['test_requirement_validation', *tests],
+                             [None, *report['tests']]):
+            if not set(TEST_DEPENDENCIES.get(t, [])).intersection(changed):
+                reusable_results[t] = result
+
+        return reusable_results
+
     def raise_for_status(self):
         """
         Raise error if one or more failures were found during validation.
@@ -143,36 +279,22 @@ class WMOCoreMetadataProfileTestSuite2:
 
         validation_errors = []
 
-        format_checkers = ['date-time', 'email', 'regex',
-                           'uri', 'uri-reference']
-
         status = {
             'id': gen_test_id('validation'),
             'code': 'PASSED'
         }
 
-        schema = WCMP2_FILES / 'wcmp2-bundled.json'
+        LOGGER.debug(f'Validating {self.record} against WCMP2 schema')
+        validator = self.resources['schema_validator']
 
-        if not schema.exists():
-            msg = "WCMP2 schema missing. Run 'pywcmp bundle sync' to cache"
-            LOGGER.error(msg)
-            raise RuntimeError(msg)
+        for error in validator.iter_errors(self.record):
+            LOGGER.debug(f'{error.json_path}: {error.message}')
+            validation_errors.append(f'{error.json_path}: {error.message}')
 
-        with schema.open() as fh:
-            LOGGER.debug(f'Validating {self.record} against {schema}')
-            validator = Draft202012Validator(
-                json.load(fh),
-                format_checker=FormatChecker(formats=format_checkers)
-            )
-
-            for error in validator.iter_errors(self.record):
-                LOGGER.debug(f'{error.json_path}: {error.message}')
-                validation_errors.append(f'{error.json_path}: {error.message}')
-
-            if validation_errors:
-                status['code'] = 'FAILED'
-                status['message'] = f'{len(validation_errors)} error(s)'
-                status['errors'] = validation_errors
+        if validation_errors:
+            status['code'] = 'FAILED'
+            status['message'] = f'{len(validation_errors)} error(s)'
+            status['errors'] = validation_errors
 
         return status
 
@@ -256,8 +378,7 @@ class WMOCoreMetadataProfileTestSuite2:
             'code': 'PASSED'
         }
 
-        rt = Path(get_userdir()) / 'wcmp-2' / 'codelists' / 'resource-type.csv'
-        resource_types = get_codelist(rt)
+        resource_types = self.resources['resource_types']
 
         if self.record['properties']['type'] not in resource_types:
             status['code'] = 'FAILED'
@@ -426,8 +547,7 @@ class WMOCoreMetadataProfileTestSuite2:
             'code': 'PASSED'
         }
 
-        cr = Path(get_userdir()) / 'wcmp-2' / 'codelists' / 'contact-role.csv'
-        contact_role_types = get_codelist(cr)
+        contact_role_types = self.resources['contact_roles']
 
         for c in self.record['properties']['contacts']:
             for role in c['roles']:
@@ -495,7 +615,7 @@ class WMOCoreMetadataProfileTestSuite2:
             'code': 'PASSED'
         }
 
-        lrs = get_link_relations()
+        lrs = self.resources['link_relations']
 
         links = self.record['links']
 
@@ -523,52 +643,42 @@ class WMOCoreMetadataProfileTestSuite2:
                         return status
 
                 if link['channel'].startswith(('origin/a/wis2', 'cache/a/wis2')):  # noqa
-                    channel_tokens = link['channel'].split('/')
-                    try:
-                        LOGGER.debug('Validating centre-id in topic')
-                        centre_id = channel_tokens[3]
+                    valid, centre_id, centre_id_known, channel_data_policy = \
+                        self.topics.parse_channel(link['channel'])
 
-                        if (not centre_id.endswith('-test') and
-                                centre_id not in self.th.topics[3]):
-                            status['code'] = 'FAILED'
-                            status['message'] = 'Invalid WIS2 topic (unknown centre-id) for Pub/Sub link channel'  # noqa
+                    LOGGER.debug('Validating centre-id in topic')
+                    if not centre_id_known:
+                        status['code'] = 'FAILED'
+                        status['message'] = 'Invalid WIS2 topic (unknown centre-id) for Pub/Sub link channel'  # noqa
 
-                            if self.relax_centre_id_checks:
-                                status['code'] = 'WARNING'
+                        if self.relax_centre_id_checks:
+                            status['code'] = 'WARNING'
 
-                            return status
-                    except IndexError:
-                        LOGGER.debug('Topic has no centre-id')
-
-                    try:
-                        LOGGER.debug('Validating data policy in channel with record properties.wmo:dataPolicy')  # noqa
-                        notification_type = channel_tokens[4]
-                        if notification_type == 'data':
-                            channel_data_policy = channel_tokens[5]
-                            if channel_data_policy != self.record['properties']['wmo:dataPolicy']:  # noqa
-                                status['code'] = 'FAILED'
-                                status['message'] = 'Inconsistent data policy in channel with wmo:dataPolicy'  # noqa
-                                return status
+                        return status
 
-                    except IndexError:
-                        LOGGER.debug('Topic has no data policy')
+                    LOGGER.debug('Validating data policy in channel with record properties.wmo:dataPolicy')  # noqa
+                    if channel_data_policy is not None:
+                        if channel_data_policy != self.record['properties']['wmo:dataPolicy']:  # noqa
+                            status['code'] = 'FAILED'
+                            status['message'] = 'Inconsistent data policy in channel with wmo:dataPolicy'  # noqa
+                            return status
 
                     LOGGER.debug('Validating topic in link channel')
-                    if not self.th.validate(link['channel'], publication=True):
+                    if not valid:
                         status['code'] = 'FAILED'
                         status['message'] = 'Invalid WIS2 topic for Pub/Sub link channel'  # noqa
                         return status
 
-                    try:
-                        LOGGER.debug('Validating centre-id in topic against WCMP2 id')  # noqa
-                        centre_id = channel_tokens[3]
-                        id_tokens = self.record['id'].split(':')
-                        if centre_id != id_tokens[3]:
-                            status['code'] = 'FAILED'
-                            status['message'] = f'centre identifiers do not match: link: {id_tokens[3]}, id: {centre_id}'  # noqa
-                            return status
-                    except IndexError:
-                        LOGGER.debug('Record id has no centre-id')
+                    if centre_id is not None:
+                        try:
+                            LOGGER.debug('Validating centre-id in topic against WCMP2 id')  # noqa
+                            id_tokens = self.record['id'].split(':')
+                            if centre_id != id_tokens[3]:
+                                status['code'] = 'FAILED'
+                                status['message'] = f'centre identifiers do not match: link: {id_tokens[3]}, id: {centre_id}'  # noqa
+                                return status
+                        except IndexError:
+                            LOGGER.debug('Record id has no centre-id')
 
             LOGGER.debug('Checking that links with security have descriptions')
             if 'security' in link:
@@ -581,6 +691,146 @@ class WMOCoreMetadataProfileTestSuite2:
         return status
 
 
+class WMOCoreMetadataProfileValidator2:
+    """
+    Reusable WMO Core Metadata Profile validator.  Holds only (read-only)
+    bundle resources, and is safe to share across threads and records
+    """
+
+    def __init__(self, resources: dict = None):
+        """
+        initializer
+
+        :param resources: optional `dict` of bundle resources (default is
+                          the resources of the active bundle at the time
+                          of each validation).  When pickled, explicit
+                          resources are reloaded from their bundle
+                          directory
+
+        :returns: `pywcmp.wcmp2.ets.WMOCoreMetadataProfileValidator2`
+        """
+
+        self._resources = resources
+
+    @property
+    def resources(self) -> dict:
+        """
+        Bundle resources of the validator
+
+        :returns: `dict` of bundle resources
+        """
+
+        # the active bundle resources are not kept, so that a newly
+        # installed bundle version is picked up by long-lived validators
+        if self._resources is None:
+            return get_bundle_resources()
+
+        return self._resources
+
+    def validate(self, record: dict, fail_on_schema_validation: bool = False,
+                 relax_centre_id_checks: bool = False,
+                 previous_report: dict = None) -> dict:
+        """
+        Validate a record against the ETS
+
+        :param record: `dict` of WCMP2 JSON
+        :param fail_on_schema_validation: `bool` of whether to stop the ETS
+                                          on failing schema validation
+        :param relax_centre_id_checks: `bool` of whether to relax centre
+                                       identifier based checks
+        :param previous_report: `dict` of a previous ETS report of the same
+                                record (see `run_tests`)
+
+        :returns: `dict` of ETS report
+        """
+
+        ts = WMOCoreMetadataProfileTestSuite2(record, self.resources)
+
+        return ts.run_tests(
+            fail_on_schema_validation=fail_on_schema_validation,
+            relax_centre_id_checks=relax_centre_id_checks,
+            previous_report=previous_report)
+
+    def __getstate__(self) -> dict:
+        # bundle resources are not pickled: explicit resources are pickled
+        # as their bundle directory and reloaded from it, otherwise process
+        # pool workers use the resources of the active bundle
+        if self._resources is None:
+            return {}
+
+        bundle_dir = self._resources.get('bundle_dir')
+
+        if bundle_dir is None:
+            msg = 'Cannot pickle validator: resources not from a bundle'
+            LOGGER.error(msg)
+            raise TypeError(msg)
+
+        return {'bundle_dir': bundle_dir}
+
+    def __setstate__(self, state: dict) -> None:
+        self._resources = None
+
+        if state.get('bundle_dir') is not None:
+            self._resources = get_bundle_resources(state['bundle_dir'])
+
+    def __repr__(self):
+        return '<WMOCoreMetadataProfileValidator2>'
+
+
+class CachingFormatChecker(FormatChecker):
+    """
+    JSON Schema format checker memoizing verdicts, as records repeat the
+    same values (URIs, emails, datetimes) many times
+    """
+
+    def __init__(self, formats: list = None,
+                 cache_size: int = FORMAT_CACHE_SIZE):
+        """
+        initializer
+
+        :param formats: `list` of formats to check (default is all)
+        :param cache_size: maximum number of verdicts kept
+
+        :returns: `pywcmp.wcmp2.ets.CachingFormatChecker`
+        """
+
+        super().__init__(formats=formats)
+
+        self._get_verdict = functools.lru_cache(
+            maxsize=cache_size, typed=True)(self._get_verdict_uncached)
+
+    def check(self, instance: object, format: str) -> None:
+        if format not in self.checkers:
+            return
+
+        try:
+            verdict = self._get_verdict(instance, format)
+        except TypeError:  # unhashable instance
+            verdict = self._get_verdict_uncached(instance, format)
+
+        if verdict is not None:
+            raise FormatError(verdict[0], cause=verdict[1])
+
+    def _get_verdict_uncached(self, instance: object,
+                              format: str) -> Union[tuple, None]:
+        """
+        Helper function to check whether an instance conforms to a format
+
+        :param instance: instance to check
+        :param format: `str` of format
+
+        :returns: `None` if instance conforms, otherwise `tuple` of
+                  message and cause
+        """
+
+        try:
+            super().check(instance, format)
+        except FormatError as err:
+            return err.message, err.cause
+
+        return None
+
+
 def get_codelist(filepath: Path) -> list:
     """
     Helper function to derive WCMP2 codelist
@@ -606,16 +856,83 @@ def get_codelist(filepath: Path) -> list:
     return names
 
 
-def get_link_relations() -> list:
+def get_link_relations(bundle_dir: Path = None) -> list:
     """
     Helper function to derive combined list of required link relations:
     - IANA
     - WCMP2 codelists
 
+    :param bundle_dir: `Path` of bundle directory (default is active bundle)
+
     :returns: `list` of all required link relations
     """
 
-    lr = Path(get_userdir()) / 'wcmp-2' / 'link-relations-1.csv'
-    lt = Path(get_userdir()) / 'wcmp-2' / 'codelists' / 'link-type.csv'
+    if bundle_dir is None:
+        bundle_dir = get_bundle_dir()
+
+    lr = bundle_dir / 'wcmp-2' / 'link-relations-1.csv'
+    lt = bundle_dir / 'wcmp-2' / 'codelists' / 'link-type.csv'
 
     return get_codelist(lr) + get_codelist(lt)
+
+
+def get_bundle_resources(bundle_dir: Path = None) -> dict:
+    """
+    Helper function to load bundle resources (schema and its validator,
+    codelists and topic hierarchy)
+
+    Resources are cached per bundle version, and are reloaded once a new
+    bundle version is installed (e.g. by `pywcmp bundle sync`).  The
+    returned resources must be treated as read-only.
+
+    :param bundle_dir: optional `pathlib.Path` of bundle directory
+                       (default is the active bundle)
+
+    :returns: `dict` of bundle resources
+    """
+
+    global _BUNDLE_RESOURCES
+
+    if bundle_dir is None:
+        bundle_dir = get_bundle_dir()
+
+    with _BUNDLE_RESOURCES_LOCK:
+        if (_BUNDLE_RESOURCES is not None and
+                _BUNDLE_RESOURCES['bundle_dir'] == bundle_dir):
+            return _BUNDLE_RESOURCES
+
+        LOGGER.info(f'Loading bundle resources from {bundle_dir}')
+
+        schema = bundle_dir / 'wcmp-2' / 'wcmp2-bundled.json'
+
+        if not schema.exists():
+            msg = "WCMP2 schema missing. Run 'pywcmp bundle sync' to cache"
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+
+        with schema.open() as fh:
+            schema = json.load(fh)
+
+        codelists = bundle_dir / 'wcmp-2' / 'codelists'
+
+        th = TopicHierarchy(tables=bundle_dir)
+
+        _BUNDLE_RESOURCES = {
+            # derived from the resolved directory, as the active version
+            # may have been switched since
+            'version': get_bundle_dir_version(bundle_dir),
+            'bundle_dir': bundle_dir,
+            'manifest': get_bundle_manifest(bundle_dir),
+            'schema': schema,
+            'schema_validator': Draft202012Validator(
+                schema,
+                format_checker=CachingFormatChecker(formats=FORMAT_CHECKERS)
+            ),
+            'resource_types': get_codelist(codelists / 'resource-type.csv'),
+            'contact_roles': get_codelist(codelists / 'contact-role.csv'),
+            'link_relations': get_link_relations(bundle_dir),
+            'topic_hierarchy': th,
+            'topics': CompiledTopicHierarchy(th)
+        }
+
+        return _BUNDLE_RESOURCES
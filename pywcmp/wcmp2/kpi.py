@@ -27,25 +27,57 @@
 
 # WMO Core Metadata Profile Key Performance Indicators (KPIs)
 
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
 import logging
 import mimetypes
 import re
+import time
 from typing import Union
 import uuid
 
-from bs4 import BeautifulSoup
-import pycountry
-
 import pywcmp
-from pywcmp.util import (check_spelling, check_url,
-                         get_current_datetime_rfc3339)
+from pywcmp.util import (check_url, get_current_datetime_rfc3339,
+                         get_spellchecker, has_markup, THISDIR)
 
 LOGGER = logging.getLogger(__name__)
 
 # round percentages to x decimal places
 ROUND = 3
 
+# timeout of a single link check, in seconds
+LINK_CHECK_TIMEOUT = 30
+
+# maximum number of links checked concurrently by a KPI evaluator
+MAX_LINK_WORKERS = 16
+
+# KPIs requiring network access (skipped in offline mode), and their
+# test identifiers
+NETWORK_KPIS = {
+    'kpi_graphic_overview': 'graphic_overview_for_metadata_records',
+    'kpi_links_health': 'links_health'
+}
+
+# text KPI patterns
+ACRONYM_REGEX = re.compile(r'\b([A-Z]{2,}\d*)\b')
+BULLETIN_HEADER_REGEX = re.compile(r'[A-Z]{4}\d{2}[\s_]*[A-Z]{4}')
+
+# record properties analyzed by text KPIs
+TEXT_PROPERTIES = ['title', 'description']
+
+# valid link media types
+VALID_LINK_MEDIA_TYPES = frozenset([
+    *mimetypes.types_map.values(),
+    'application/bufr',
+    'application/grib',
+    'text/turtle'
+])
+
+# ISO 3166-1 alpha-3 country codes (precomputed from pycountry)
+with (THISDIR / 'resources' / 'iso3166-alpha3.txt').open() as fh:
+    ISO3166_ALPHA3_CODES = frozenset(
+        line.strip() for line in fh
+        if line.strip() and not line.startswith('#'))
+
 
 def gen_test_id(test_id: str) -> str:
     """
@@ -62,24 +94,45 @@ def gen_test_id(test_id: str) -> str:
 class WMOCoreMetadataProfileKeyPerformanceIndicators:
     """Key Performance Indicators for WMO Core Metadata Profile"""
 
-    def __init__(self, data):
+    def __init__(self, data, executor: Executor = None,
+                 text_analysis: dict = None):
         """
         initializer
 
         :param data: dict of WCMP JSON
+        :param executor: optional `concurrent.futures.Executor` to run
+                         KPIs alongside links health and to check links
+                         with (default is a new thread pool per
+                         evaluation)
+        :param text_analysis: optional `dict` of text analysis of the
+                              record (see `analyze_records`)
 
         :returns: `pywcmp.wcmp2.kpi.WMOCoreMetadataProfileKeyPerformanceIndicators`  # noqa
         """
 
         self.data = data
+        self.executor = executor
+        self.text_analysis = text_analysis
         self.codelists = None
+        self.deadline = None
 
-        self.valid_link_mime_types = list(mimetypes.types_map.values())
-        self.valid_link_mime_types.extend([
-            'application/bufr',
-            'application/grib',
-            'text/turtle'
-        ])
+        self.valid_link_mime_types = VALID_LINK_MEDIA_TYPES
+
+    def get_text_analysis(self, property_: str) -> dict:
+        """
+        Helper function to derive the text analysis of a record property,
+        analyzing all text properties at once on first use
+
+        :param property_: `str` of record property (`title` or
+                          `description`)
+
+        :returns: `dict` of text analysis (see `analyze_text`)
+        """
+
+        if self.text_analysis is None:
+            self.text_analysis = analyze_records([self.data])[0]
+
+        return self.text_analysis[property_]
 
     @property
     def identifier(self):
@@ -105,65 +158,56 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
 
         id_ = gen_test_id('good_quality_title')
         title = 'Good quality title'
-        acronym_regex = r'\b([A-Z]{2,}\d*)\b'
 
         LOGGER.info(f'Running {title}')
 
         title = self.data['properties']['title']
 
-        title_words = []
-
-        try:
-            LOGGER.debug('Testing number of words')
-            title_words = title.split()
-        except Exception as err:
-            LOGGER.debug(err)
+        if not isinstance(title, str):
+            LOGGER.debug(f'Invalid title: {title}')
             return
 
-        title_words = title.split()
+        analysis = self.get_text_analysis('title')
 
         LOGGER.debug('Testing number of words')
-        if len(title_words) >= 3:
+        if analysis['words'] >= 3:
             score += 1
         else:
             comments.append('Title has less than 3 words')
 
         LOGGER.debug('Testing number of characters')
-        if len(title) <= 150:
+        if analysis['length'] <= 150:
             score += 1
         else:
             comments.append('Title has more than 150 characters')
 
         LOGGER.debug('Testing for alphanumeric characters')
-        if all(x.isalnum() for x in title_words):
+        if analysis['alphanumeric']:
             score += 1
         else:
             comments.append('Title contains non-printable characters')
 
         LOGGER.debug('Testing for sentence case')
-        title2 = re.sub(acronym_regex, '', title).strip()
-        if title2.capitalize() == title2:
+        if analysis['sentence_case']:
             score += 1
         else:
             comments.append('Title is not sentence case')
 
         LOGGER.debug('Testing for acronyms')
-
-        if len(re.findall(acronym_regex, title)) <= 3:
+        if analysis['acronyms'] <= 3:
             score += 1
         else:
             comments.append('Title has more than 3 acronyms')
 
         LOGGER.debug('Testing for bulletin headers')
-        has_bulletin_header = re.search(r'[A-Z]{4}\d{2}[\s_]*[A-Z]{4}', title)
-        if not has_bulletin_header:
+        if not analysis['bulletin_header']:
             score += 1
         else:
             score -= 1
             comments.append('Title contains bulletin header')
 
         LOGGER.debug('Testing for spelling')
-        misspelled = check_spelling(title)
+        misspelled = analysis['misspelled']
 
         if not misspelled:
             score += 1
@@ -196,27 +240,28 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
         if description is None:
             comments.append('Description is null')
 
+        analysis = self.get_text_analysis('description')
+
         LOGGER.debug('Testing number of characters')
-        if 16 <= len(description) <= 2048:
+        if 16 <= analysis['length'] <= 2048:
             score += 1
         else:
             comments.append('Description is not between 16 and 2048 characters')  # noqa
 
         LOGGER.debug('Testing for HTML detection')
-        if not bool(BeautifulSoup(description, "html.parser").find()):
+        if not analysis['markup']:
             score += 1
         else:
             comments.append('Description contains markup')
 
         LOGGER.debug('Testing for bulletin headers')
-        has_bulletin_header = re.search(r'[A-Z]{4}\d{2}[\s_]*[A-Z]{4}', description)  # noqa
-        if not has_bulletin_header:
+        if not analysis['bulletin_header']:
             score += 1
         else:
             comments.append('Description contains bulletin header')
 
         LOGGER.debug('Testing for spelling')
-        misspelled = check_spelling(description)
+        misspelled = analysis['misspelled']
 
         if not misspelled:
             score += 1
@@ -320,11 +365,17 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
             if link.get('rel') == 'preview':
                 LOGGER.debug('Found a preview link')
 
+                timeout = self._get_link_check_timeout()
+                if timeout > 0:
+                    result = check_url(link['href'], False, timeout)
+
+                if timeout == 0 or self._is_cut_short(result, timeout):
+                    comments.append(f"URL not evaluated (deadline exceeded): {link['href']}")  # noqa
+                    continue
+
                 total += 3
                 score += 1
 
-                result = check_url(link['href'], False)
-
                 LOGGER.debug('Testing whether link is a web image file type')
                 mime_type = link.get('type', '')
                 if mime_type in web_image_mime_types and result['mime-type'] in web_image_mime_types:  # noqa
@@ -336,7 +387,7 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
                 if result['accessible']:
                     score += 1
                 else:
-                    comments.append(f"URL not accessible: {link['href']}")
+                    comments.append(f"URL not accessible ({result['error']}): {link['href']}")  # noqa
 
         return id_, title, total, score, comments
 
@@ -382,12 +433,36 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
         LOGGER.debug('Collapsing distinct links')
         links = list({lnk.get('href'): lnk for lnk in links}.values())
 
-        with ThreadPoolExecutor() as tpe:
-            for link_result in tpe.map(self._check_link_health_single, links):
-                if link_result is not None:
-                    total += link_result[0]
-                    score += link_result[1]
-                    comments.extend(link_result[2])
+        executor = self.executor
+        if executor is None:
+            executor = ThreadPoolExecutor()
+
+        try:
+            futures = [executor.submit(self._check_link_health_single, link)
+                       for link in links]
+
+            timeout = None
+            if self.deadline is not None:
+                timeout = max(self.deadline - time.monotonic(), 0)
+
+            wait(futures, timeout=timeout)
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        for link, future in zip(links, futures):
+            if future.cancel() or not future.done():
+                LOGGER.debug(f"Deadline exceeded, skipping {link['href']}")
+                link_result = (0, 0, [
+                    f"URL not evaluated (deadline exceeded): '{link['href']}'"
+                ])
+            else:
+                link_result = future.result()
+
+            if link_result is not None:
+                total += link_result[0]
+                score += link_result[1]
+                comments.extend(link_result[2])
 
         return id_, title, total, score, comments
 
@@ -423,7 +498,8 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
 
         if countries:
             for country in countries:
-                if pycountry.countries.get(alpha_3=country) is None:
+                if (not isinstance(country, str) or
+                        country.upper() not in ISO3166_ALPHA3_CODES):
                     valid_countries = False
                     break
 
@@ -493,15 +569,27 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
 
         return id_, title, total, score, comments
 
-    def evaluate(self, kpi: str = None) -> dict:
+    def evaluate(self, kpi: str = None, deadline: float = None,
+                 offline: bool = False) -> dict:
         """
         Convenience function to run all tests
 
         :param kpi: `str` of KPI identifier
+        :param deadline: optional time budget of the evaluation, in seconds.
+                         Links not checked within the deadline are reported
+                         as not evaluated (and not scored)
+        :param offline: `bool` of whether to skip KPIs requiring network
+                        access (percentage and grade are calculated over
+                        the evaluated KPIs only)
 
         :returns: `dict` of overall test report
         """
 
+        if deadline is not None:
+            self.deadline = time.monotonic() + deadline
+        else:
+            self.deadline = None
+
         kpis_to_run = []
 
         for f in dir(WMOCoreMetadataProfileKeyPerformanceIndicators):
@@ -520,6 +608,17 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
             else:
                 kpis_to_run = [selected_kpi]
 
+        not_evaluated = []
+
+        if offline:
+            not_evaluated = [k for k in kpis_to_run if k in NETWORK_KPIS]
+            kpis_to_run = [k for k in kpis_to_run if k not in NETWORK_KPIS]
+
+            if not kpis_to_run:
+                msg = f'KPI {kpi} requires network access (offline mode)'
+                LOGGER.error(msg)
+                raise ValueError(msg)
+
         LOGGER.info(f'Evaluating KPIs: {kpis_to_run}')
 
         results = {
@@ -531,25 +630,39 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
             'tests': []
         }
 
-        for kpi in kpis_to_run:
-            LOGGER.debug(f'Running {kpi}')
-            result = getattr(self, kpi)()
-            LOGGER.debug(f'Raw result: {result}')
-            LOGGER.debug('Calculating result')
-            try:
-                percentage = round(float((result[3] / result[2]) * 100), ROUND)
-            except ZeroDivisionError:
-                percentage = None
-
-            results['tests'].append({
-                'id': result[0],
-                'title': result[1],
-                'total': result[2],
-                'score': result[3],
-                'comments': result[4],
-                'percentage': percentage
-            })
-            LOGGER.debug(f'{kpi}: {result[2]} / {result[3]} = {percentage}')
+        # with network-bound KPIs, the other KPIs run on the executor,
+        # overlapping with links health, which runs in the calling thread
+        # as it waits on link checks submitted to the same (bounded)
+        # executor.  A thread pool is only created for the evaluation if
+        # no executor was given.  Results are kept in KPI order
+        network_kpis = [k for k in kpis_to_run if k in NETWORK_KPIS]
+        kpi_results = {}
+
+        own_executor = self.executor is None and bool(network_kpis)
+        if own_executor:
+            self.executor = ThreadPoolExecutor(
+                max_workers=MAX_LINK_WORKERS,
+                thread_name_prefix='pywcmp-links')
+
+        try:
+            futures = {}
+            if network_kpis and len(kpis_to_run) > 1:
+                futures = {kpi: self.executor.submit(self._run_kpi, kpi)
+                           for kpi in kpis_to_run
+                           if kpi != 'kpi_links_health'}
+
+            for kpi in kpis_to_run:
+                if kpi not in futures:
+                    kpi_results[kpi] = self._run_kpi(kpi)
+
+            for kpi, future in futures.items():
+                kpi_results[kpi] = future.result()
+        finally:
+            if own_executor:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+        results['tests'] = [kpi_results[kpi] for kpi in kpis_to_run]
 
         LOGGER.debug('Calculating total results')
         results['summary'] = generate_summary(results)
@@ -558,8 +671,46 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
         overall_grade = calculate_grade(results['summary']['percentage'])
         results['summary']['grade'] = overall_grade
 
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            results['summary']['deadline_exceeded'] = True
+
+        if offline:
+            LOGGER.debug(f'KPIs not evaluated (offline): {not_evaluated}')
+            results['summary']['offline'] = True
+            results['summary']['not_evaluated'] = [
+                gen_test_id(NETWORK_KPIS[k]) for k in not_evaluated]
+
         return results
 
+    def _run_kpi(self, kpi: str) -> dict:
+        """
+        Helper function to run a KPI
+
+        :param kpi: `str` of KPI method name
+
+        :returns: `dict` of KPI result
+        """
+
+        LOGGER.debug(f'Running {kpi}')
+        result = getattr(self, kpi)()
+        LOGGER.debug(f'Raw result: {result}')
+        LOGGER.debug('Calculating result')
+        try:
+            percentage = round(float((result[3] / result[2]) * 100), ROUND)
+        except ZeroDivisionError:
+            percentage = None
+
+        LOGGER.debug(f'{kpi}: {result[2]} / {result[3]} = {percentage}')
+
+        return {
+            'id': result[0],
+            'title': result[1],
+            'total': result[2],
+            'score': result[3],
+            'comments': result[4],
+            'percentage': percentage
+        }
+
     def _check_link_health_single(self, link: dict) -> Union[tuple, None]:
         """
         Helper function to calculate link health
@@ -580,15 +731,22 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
             return
 
         if url.startswith('http'):
-            total += 2
+            timeout = self._get_link_check_timeout()
+            if timeout > 0:
+                LOGGER.debug(f'Testing whether link resolves: "{url}"')
+                result = check_url(url, False, timeout)
+
+            if timeout == 0 or self._is_cut_short(result, timeout):
+                return 0, 0, [
+                    f"URL not evaluated (deadline exceeded): '{url}'"]
 
-            LOGGER.debug(f'Testing whether link resolves: "{url}"')
-            result = check_url(url, False)
+            total += 2
 
             if result['accessible']:
                 score += 1
             else:
-                comments.append(f"URL not accessible: '{url}'")
+                comments.append(
+                    f"URL not accessible ({result['error']}): '{url}'")
 
             LOGGER.debug(f'Validating media type for "{url}"')
             link_type = link.get('type')
@@ -606,6 +764,218 @@ class WMOCoreMetadataProfileKeyPerformanceIndicators:
 
         return total, score, comments
 
+    def _get_link_check_timeout(self) -> float:
+        """
+        Helper function to derive the timeout of a link check, bounded by
+        the evaluation deadline
+
+        :returns: `float` of timeout, in seconds (`0` if the deadline
+                  is exceeded)
+        """
+
+        if self.deadline is None:
+            return LINK_CHECK_TIMEOUT
+
+        remaining = self.deadline - time.monotonic()
+
+        return max(min(remaining, LINK_CHECK_TIMEOUT), 0)
+
+    def _is_cut_short(self, result: dict, timeout: float) -> bool:
+        """
+        Helper function to test whether a link check timed out because of
+        the evaluation deadline (rather than the link check timeout)
+
+        :param result: `dict` of link check result
+        :param timeout: `float` of timeout of the link check, in seconds
+
+        :returns: `bool` of whether the link check was cut short
+        """
+
+        return (result.get('error') == 'timeout' and
+                timeout < LINK_CHECK_TIMEOUT)
+
+
+class WMOCoreMetadataProfileKPIEvaluator:
+    """
+    Reusable Key Performance Indicator evaluator, e.g. created once per
+    process.  Owns a bounded thread pool, shared by all evaluations, to run
+    KPIs alongside links health and to check links with, and is safe to
+    share across threads
+    """
+
+    def __init__(self, max_workers: int = MAX_LINK_WORKERS):
+        """
+        initializer
+
+        :param max_workers: maximum number of links checked concurrently
+
+        :returns: `pywcmp.wcmp2.kpi.WMOCoreMetadataProfileKPIEvaluator`
+        """
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='pywcmp-links')
+
+    def evaluate(self, record: dict, kpi: str = None,
+                 deadline: float = None, offline: bool = False,
+                 text_analysis: dict = None) -> dict:
+        """
+        Evaluate the KPIs of a record
+
+        :param record: `dict` of WCMP JSON
+        :param kpi: `str` of KPI identifier (default is all)
+        :param deadline: optional time budget of the evaluation, in seconds
+        :param offline: `bool` of whether to skip KPIs requiring network
+                        access
+        :param text_analysis: optional `dict` of text analysis of the
+                              record (see `analyze_records`)
+
+        :returns: `dict` of KPI report
+        """
+
+        kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(
+            record, executor=self.executor, text_analysis=text_analysis)
+
+        return kpis.evaluate(kpi, deadline, offline)
+
+    def evaluate_records(self, records: list, kpi: str = None,
+                         deadline: float = None,
+                         offline: bool = False) -> list:
+        """
+        Evaluate the KPIs of a batch of records, spellchecking the text
+        of all records at once
+
+        :param records: `list` of `dict` of WCMP JSON
+        :param kpi: `str` of KPI identifier (default is all)
+        :param deadline: optional time budget of each evaluation, in
+                         seconds
+        :param offline: `bool` of whether to skip KPIs requiring network
+                        access
+
+        :returns: `list` of `dict` of KPI reports
+        """
+
+        analyses = analyze_records(records)
+
+        return [self.evaluate(record, kpi, deadline, offline, analysis)
+                for record, analysis in zip(records, analyses)]
+
+    def close(self) -> None:
+        """
+        Shut down the link check thread pool
+
+        :returns: `None`
+        """
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return '<WMOCoreMetadataProfileKPIEvaluator>'
+
+
+def analyze_texts(texts: list) -> list:
+    """
+    Analyzes texts for text KPIs (title, description), tokenizing each
+    text once and spellchecking all texts at once
+
+    :param texts: `list` of `str` of texts
+
+    :returns: `list` of `dict` of text analysis (length, number of words,
+              whether all words are alphanumeric, whether sentence case
+              (disregarding acronyms), number of acronyms, whether
+              containing a bulletin header or markup, and misspelled words,
+              sorted)
+    """
+
+    spell = get_spellchecker()
+
+    analyses = []
+    vocabulary = set()
+
+    for text in texts:
+        words = text.split()
+
+        acronyms = 0
+        pieces = []
+        position = 0
+        for match in ACRONYM_REGEX.finditer(text):
+            acronyms += 1
+            pieces.append(text[position:match.start()])
+            position = match.end()
+        pieces.append(text[position:])
+        text_without_acronyms = ''.join(pieces).strip()
+
+        tokens = {token.lower() for token in spell.split_words(text)}
+        vocabulary.update(tokens)
+
+        analyses.append({
+            'length': len(text),
+            'words': len(words),
+            'alphanumeric': all(word.isalnum() for word in words),
+            'sentence_case': (text_without_acronyms.capitalize() ==
+                              text_without_acronyms),
+            'acronyms': acronyms,
+            'bulletin_header': BULLETIN_HEADER_REGEX.search(text) is not None,
+            'markup': has_markup(text),
+            'tokens': tokens
+        })
+
+    LOGGER.debug(f'Spellchecking {len(vocabulary)} distinct words')
+    unknown = spell.unknown(vocabulary)
+
+    for analysis in analyses:
+        analysis['misspelled'] = sorted(analysis.pop('tokens') & unknown)
+
+    return analyses
+
+
+def analyze_text(text: str) -> dict:
+    """
+    Analyzes a text for text KPIs (see `analyze_texts`)
+
+    :param text: `str` of text
+
+    :returns: `dict` of text analysis
+    """
+
+    return analyze_texts([text])[0]
+
+
+def analyze_records(records: list) -> list:
+    """
+    Analyzes the text properties (title, description) of records for text
+    KPIs, e.g. to evaluate a batch of records
+
+    :param records: `list` of `dict` of WCMP JSON
+
+    :returns: `list` of `dict` of text analysis per text property
+              (`None` if not a string)
+    """
+
+    texts = []
+    for record in records:
+        for property_ in TEXT_PROPERTIES:
+            value = record.get('properties', {}).get(property_)
+            if isinstance(value, str):
+                texts.append(value)
+
+    analyses = iter(analyze_texts(texts))
+
+    results = []
+    for record in records:
+        result = {}
+        for property_ in TEXT_PROPERTIES:
+            value = record.get('properties', {}).get(property_)
+            result[property_] = next(analyses) if isinstance(value, str) else None  # noqa
+        results.append(result)
+
+    return results
+
 
 def generate_summary(results: dict) -> dict:
     """
@@ -0,0 +1,143 @@
+###############################################################################
+#
+# Authors: Tom Kralidis <tomkralidis@gmail.com>
+#
+# Copyright (c) 2026 Tom Kralidis
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+###############################################################################
+
+# compiled WIS2 topic hierarchy, for validating Pub/Sub link channels
+
+import functools
+import logging
+
+from pywis_topics.topics import TopicHierarchy
+
+LOGGER = logging.getLogger(__name__)
+
+# maximum number of channel verdicts kept
+CHANNEL_CACHE_SIZE = 4096
+
+
+class CompiledTopicHierarchy:
+    """
+    WIS2 topic hierarchy compiled for publication channel validation.
+
+    Each level of the topic hierarchy (channel, version, system, centre-id,
+    notification-type, data-policy) is an independent codelist, and
+    Earth system discipline subtopics are matched as a whole (strict
+    mode), so the hierarchy compiles into one lookup table per level.
+    Channel verdicts are memoized (shared by all records validated against
+    the same bundle)
+    """
+
+    def __init__(self, th: TopicHierarchy,
+                 cache_size: int = CHANNEL_CACHE_SIZE):
+        """
+        initializer
+
+        :param th: `pywis_topics.topics.TopicHierarchy`
+        :param cache_size: maximum number of channel verdicts kept
+
+        :returns: `pywcmp.wcmp2.topics.CompiledTopicHierarchy`
+        """
+
+        self.levels = tuple(frozenset(level) for level in th.topics[:6])
+        self.esd_subtopics = frozenset(th.topics[6])
+
+        self.parse_channel = functools.lru_cache(maxsize=cache_size)(
+            self._parse_channel)
+
+    def _parse_channel(self, channel: str) -> tuple:
+        """
+        Validates a channel for publication (equivalent to
+        `TopicHierarchy.validate(channel, publication=True)`) and extracts
+        its centre-id and data policy, in one pass
+
+        :param channel: `str` of channel (topic)
+
+        :returns: `tuple` of whether the channel is valid for publication,
+                  centre-id (`None` if missing), whether the centre-id is
+                  known (or a test centre-id), and data policy (`None`
+                  if missing or not a data channel)
+        """
+
+        if channel in ['/', None]:
+            msg = 'Topic hierarchy is empty'
+            LOGGER.warning(msg)
+            raise ValueError(msg)
+
+        tokens = channel.split('/')
+        num_tokens = len(tokens)
+
+        centre_id = tokens[3] if num_tokens > 3 else None
+        centre_id_known = (centre_id is None or
+                           centre_id.endswith('-test') or
+                           centre_id in self.levels[3])
+
+        data_policy = None
+        if num_tokens > 5 and tokens[4] == 'data':
+            data_policy = tokens[5]
+
+        return (self._is_valid(channel, tokens), centre_id,
+                centre_id_known, data_policy)
+
+    def _is_valid(self, channel: str, tokens: list) -> bool:
+        """
+        Helper function to validate a channel for publication
+
+        :param channel: `str` of channel (topic)
+        :param tokens: `list` of channel tokens
+
+        :returns: `bool` of whether channel is valid for publication
+        """
+
+        core_tokens = tokens[:6]
+        esd_subtopic = '/'.join(tokens[6:])
+
+        if '#' in channel or '+' in channel:
+            LOGGER.debug('Invalid characters for publication')
+            return False
+
+        if len(core_tokens) < 5:
+            LOGGER.debug('Not enough tokens for publication')
+            return False
+
+        if core_tokens[4] not in ['data', 'metadata']:
+            LOGGER.debug('Invalid token for publication')
+            return False
+
+        if core_tokens[-2] == 'data' and not esd_subtopic:
+            LOGGER.debug('Earth system discipline subtopic is empty')
+            return False
+
+        for count, value in enumerate(core_tokens):
+            if not value:
+                continue
+            if count == 3 and value.endswith('-test'):
+                continue
+            if value not in self.levels[count]:
+                return False
+
+        if esd_subtopic:
+            return (esd_subtopic in self.esd_subtopics or
+                    '/experimental' in esd_subtopic)
+
+        return True
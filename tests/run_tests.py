@@ -26,15 +26,59 @@
 #
 ###############################################################################
 
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import json
 import os
+import pickle
+import re
+import shutil
+import socket
+import ssl
+from pathlib import Path
+import tempfile
+import threading
+import time
 import unittest
-
+from unittest import mock
+from urllib.error import HTTPError, URLError
+import zipfile
+
+from click.testing import CliRunner
+from jsonschema import Draft202012Validator, FormatChecker
+
+from pywcmp.batch import (get_index_path, iter_records, load_index,
+                          run_batch, validate_content)
+from pywcmp.bundle import (BUNDLE_VERSIONS_KEEP, export_bundle,
+                           get_bundle_dir, get_bundle_dir_version,
+                           get_bundle_manifest, get_bundle_version,
+                           install_bundle, sync_bundle)
+from pywcmp.cache import get_cache_key, ReportCache
 from pywcmp.errors import TestSuiteError
 from pywcmp.ets import WMOCoreMetadataProfileTestSuite2
+from pywcmp.kpi import validate as validate_kpi
+from pywcmp.serve import request_report, serve, ValidationRequestHandler
+from pywcmp.wcmp2.ets import (CachingFormatChecker, FORMAT_CHECKERS,
+                              get_bundle_resources,
+                              WMOCoreMetadataProfileValidator2)
 from pywcmp.wcmp2.kpi import (
-    calculate_grade, WMOCoreMetadataProfileKeyPerformanceIndicators)
-from pywcmp.util import parse_wcmp
+    analyze_records, analyze_texts, calculate_grade, gen_test_id,
+    ISO3166_ALPHA3_CODES, VALID_LINK_MEDIA_TYPES,
+    WMOCoreMetadataProfileKeyPerformanceIndicators,
+    WMOCoreMetadataProfileKPIEvaluator)
+from pywcmp.util import (check_spelling, check_url, classify_url_error,
+                         fetch_record,
+                         get_userdir, has_markup, is_ssl_verification_error,
+                         is_valid_created_datetime, parse_wcmp, set_userdir,
+                         urlopen_)
+from pywcmp.report import merge_reports
+from pywcmp.validate import validate_record
+
+try:
+    from pywcmp import pygeoapi_plugin
+except ImportError:  # pygeoapi is optional
+    pygeoapi_plugin = None
 
 
 def get_test_file_path(filename):
@@ -81,6 +125,89 @@ class WCMP2ETSTest(unittest.TestCase):
             self.assertEqual(codes.count('PASSED'), 12)
             self.assertEqual(codes.count('SKIPPED'), 0)
 
+    def test_validator(self):
+        """Simple tests for a reusable (and picklable) validator"""
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            data = json.load(fh)
+
+        validator = pickle.loads(pickle.dumps(
+            WMOCoreMetadataProfileValidator2()))
+
+        for _ in range(2):
+            results = validator.validate(data, fail_on_schema_validation=True)
+
+            codes = [r['code'] for r in results['tests']]
+            self.assertEqual(codes.count('FAILED'), 0)
+            self.assertEqual(codes.count('PASSED'), 12)
+
+        # resources of a newly installed bundle are picked up
+        bundles = [{'version': 'a'}, {'version': 'b'}]
+        with mock.patch('pywcmp.wcmp2.ets.get_bundle_resources',
+                        side_effect=bundles):
+            self.assertEqual(validator.resources['version'], 'a')
+            self.assertEqual(validator.resources['version'], 'b')
+
+        resources = get_bundle_resources()
+        validator = WMOCoreMetadataProfileValidator2(resources)
+        self.assertIs(validator.resources, resources)
+
+        # explicit resources are reloaded from their bundle directory,
+        # whichever bundle is active
+        state = pickle.dumps(validator)
+        with mock.patch('pywcmp.wcmp2.ets.get_bundle_dir',
+                        return_value=Path('/nonexistent')):
+            validator = pickle.loads(state)
+            self.assertEqual(validator.resources['bundle_dir'],
+                             resources['bundle_dir'])
+            self.assertEqual(validator.resources['manifest'],
+                             resources['manifest'])
+
+        validator = WMOCoreMetadataProfileValidator2({'version': 'a'})
+        with self.assertRaises(TypeError):
+            pickle.dumps(validator)
+
+    def test_parse_channel(self):
+        """Test compiled channel validation against pywis-topics"""
+
+        resources = get_bundle_resources()
+        th = resources['topic_hierarchy']
+        topics = resources['topics']
+
+        wis2 = 'origin/a/wis2/ca-eccc-msc'
+        channels = [
+            f'{wis2}/data/core/weather/surface-based-observations/synop',
+            f'{wis2}/data/recommended/weather/surface-based-observations',
+            f'{wis2}/data/core/weather/experimental/foo',
+            f'{wis2}/data/core/weather/#',
+            f'{wis2}/data/core/foo/bar',
+            f'{wis2}/data/core',
+            f'{wis2}/metadata',
+            wis2,
+            'origin/a/wis2',
+            'origin/b/wis2/ca-eccc-msc/metadata',
+            'cache/a/wis2/ca-eccc-msc/data/core/weather',
+            'origin/a/wis2/+/data/core/weather/surface-based-observations',
+            'origin/a/wis2/xx-foo/data/core/weather',
+            'origin/a/wis2/xx-foo-test/data/core/weather'
+        ]
+
+        for channel in channels:
+            self.assertEqual(topics.parse_channel(channel)[0],
+                             th.validate(channel, publication=True), channel)
+
+        self.assertEqual(topics.parse_channel(channels[1]),
+                         (True, 'ca-eccc-msc', True, 'recommended'))
+        self.assertEqual(topics.parse_channel(channels[6]),
+                         (True, 'ca-eccc-msc', True, None))
+        self.assertEqual(topics.parse_channel(channels[-2])[1:3],
+                         ('xx-foo', False))
+        self.assertEqual(topics.parse_channel(channels[-1])[1:3],
+                         ('xx-foo-test', True))
+
+        with self.assertRaises(ValueError):
+            topics.parse_channel('/')
+
     def test_centre_id(self):
         """Simple tests for a centre-id validation"""
 
@@ -150,6 +277,46 @@ class WCMP2ETSTest(unittest.TestCase):
             with self.assertRaises(ValueError):
                 ts.run_tests(fail_on_schema_validation=True)
 
+    def test_previous_report(self):
+        """Simple tests for re-running only tests affected by bundle changes"""
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            data = json.load(fh)
+
+        ts = WMOCoreMetadataProfileTestSuite2(data)
+        report = ts.run_tests(fail_on_schema_validation=True)
+
+        type_id = 'http://wis.wmo.int/spec/wcmp/2/conf/core/type'
+        for test in report['tests']:
+            test['code'] = 'SKIPPED'
+
+        results = ts.run_tests(fail_on_schema_validation=True,
+                               previous_report=report)
+        codes = [r['code'] for r in results['tests']]
+        self.assertEqual(codes.count('SKIPPED'), 12)
+
+        results = ts.run_tests(previous_report=report)
+        codes = [r['code'] for r in results['tests']]
+        self.assertEqual(codes.count('PASSED'), 12)
+
+        resource_types = 'wcmp-2/codelists/resource-type.csv'
+        report['bundle']['artifacts'][resource_types] = 'changed'
+
+        results = ts.run_tests(fail_on_schema_validation=True,
+                               previous_report=report)
+        for test in results['tests']:
+            if test['id'] == type_id:
+                self.assertEqual(test['code'], 'PASSED')
+            else:
+                self.assertEqual(test['code'], 'SKIPPED')
+
+        report['record_hash'] = 'changed'
+
+        results = ts.run_tests(fail_on_schema_validation=True,
+                               previous_report=report)
+        codes = [r['code'] for r in results['tests']]
+        self.assertEqual(codes.count('PASSED'), 12)
+
     def test_raise_for_status(self):
         """Simple test for raise_for_status"""
 
@@ -380,6 +547,225 @@ class WCMP2KPITest(unittest.TestCase):
         self.assertEqual(results['summary']['percentage'], 100)
         self.assertEqual(results['summary']['grade'], 'A')
 
+    def test_kpi_executor(self):
+        """Tests for running KPIs on a supplied executor"""
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            data = json.load(fh)
+
+        link_check = {'accessible': True, 'mime-type': 'text/html'}
+
+        with mock.patch('pywcmp.wcmp2.kpi.check_url',
+                        return_value=link_check):
+            results = WMOCoreMetadataProfileKeyPerformanceIndicators(
+                data).evaluate()
+
+            # a single worker is enough: links health does not wait on
+            # link checks from a worker of the same executor
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                with mock.patch('pywcmp.wcmp2.kpi.ThreadPoolExecutor') as tpe:
+                    kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(
+                        data, executor=executor)
+                    self.assertEqual(kpis.evaluate()['tests'],
+                                     results['tests'])
+                    tpe.assert_not_called()
+
+        offline_results = WMOCoreMetadataProfileKeyPerformanceIndicators(
+            data).evaluate(offline=True)
+
+        for test in offline_results['tests']:
+            self.assertIn(test, results['tests'])
+
+    def test_kpi_deadline(self):
+        """Tests for an expired KPI evaluation deadline"""
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            data = json.load(fh)
+
+        with mock.patch('pywcmp.wcmp2.kpi.check_url') as check_url:
+            kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(data)
+            results = kpis.evaluate(deadline=0)
+            check_url.assert_not_called()
+
+        self.assertTrue(results['summary']['deadline_exceeded'])
+
+        tests = {test['id']: test for test in results['tests']}
+        links_health = tests[gen_test_id('links_health')]
+        self.assertEqual(links_health['total'], 0)
+        self.assertTrue(links_health['comments'])
+        for comment in links_health['comments']:
+            self.assertTrue(comment.startswith(
+                'URL not evaluated (deadline exceeded)'))
+
+        # KPIs without link checks are still evaluated
+        offline_results = WMOCoreMetadataProfileKeyPerformanceIndicators(
+            data).evaluate(offline=True)
+
+        for test in offline_results['tests']:
+            self.assertIn(test, results['tests'])
+
+        results = WMOCoreMetadataProfileKeyPerformanceIndicators(
+            data).evaluate(offline=True, deadline=60)
+        self.assertNotIn('deadline_exceeded', results['summary'])
+
+    def test_text_analysis(self):
+        """Tests for text analysis of the text KPIs"""
+
+        texts = [
+            'Surface weather observations from the WMO GBON network',
+            'SYNOP reports SMAA01 LFPW from all RA VI stations of EUMETNET',
+            'weather Observations',
+            '<p>Hourly temperature observatons</p>',
+            'Données météorologiques',
+            ''
+        ]
+
+        # reference: the text metrics as computed by the text KPIs
+        # before text analysis
+        acronym_regex = r'\b([A-Z]{2,}\d*)\b'
+        bulletin_header_regex = r'[A-Z]{4}\d{2}[\s_]*[A-Z]{4}'
+
+        for text, analysis in zip(texts, analyze_texts(texts)):
+            words = text.split()
+            text2 = re.sub(acronym_regex, '', text).strip()
+
+            self.assertEqual(analysis['length'], len(text))
+            self.assertEqual(analysis['words'], len(words))
+            self.assertEqual(analysis['alphanumeric'],
+                             all(x.isalnum() for x in words))
+            self.assertEqual(analysis['sentence_case'],
+                             text2.capitalize() == text2)
+            self.assertEqual(analysis['acronyms'],
+                             len(re.findall(acronym_regex, text)))
+            self.assertEqual(analysis['bulletin_header'],
+                             re.search(bulletin_header_regex,
+                                       text) is not None)
+            self.assertEqual(analysis['markup'], has_markup(text))
+            self.assertEqual(sorted(analysis['misspelled']),
+                             sorted(check_spelling(text)))
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            data = json.load(fh)
+
+        record = json.loads(json.dumps(data))
+        record['properties']['title'] = texts[3]
+        record['properties']['description'] = texts[1]
+
+        no_title = json.loads(json.dumps(data))
+        no_title['properties']['title'] = None
+
+        records = [data, record, no_title]
+        analyses = analyze_records(records)
+
+        self.assertIsNone(analyses[2]['title'])
+        self.assertEqual(analyses[1]['title'], analyze_texts([texts[3]])[0])
+
+        # KPIs from a batch analysis match the KPIs of each record
+        for record, analysis in zip(records[:2], analyses):
+            for kpi in ['title', 'description']:
+                expected = WMOCoreMetadataProfileKeyPerformanceIndicators(
+                    record).evaluate(kpi)['tests']
+                results = WMOCoreMetadataProfileKeyPerformanceIndicators(
+                    record, text_analysis=analysis).evaluate(kpi)['tests']
+                self.assertEqual(results, expected)
+
+    def test_lookups(self):
+        """Tests for country code and link media type lookups"""
+
+        self.assertEqual(len(ISO3166_ALPHA3_CODES), 249)
+        for code in ['CAN', 'CHE', 'FRA', 'ZWE']:
+            self.assertIn(code, ISO3166_ALPHA3_CODES)
+        for code in ['CA', 'XXX', '#', '']:
+            self.assertNotIn(code, ISO3166_ALPHA3_CODES)
+
+        for media_type in ['application/bufr', 'application/grib',
+                           'application/json', 'text/html', 'text/turtle']:
+            self.assertIn(media_type, VALID_LINK_MEDIA_TYPES)
+        for media_type in ['application/x-unknown', 'BUFR', None]:
+            self.assertNotIn(media_type, VALID_LINK_MEDIA_TYPES)
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            data = json.load(fh)
+
+        contact = data['properties']['contacts'][0]
+        for country, valid in [('CAN', True), ('can', True), ('XXX', False),
+                               ('CA', False), (124, False)]:
+            contact['addresses'] = [{'country': country}]
+            kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(data)
+            comments = kpis.evaluate('contacts')['tests'][0]['comments']
+            self.assertEqual(
+                'countries should be ISO 3166-1 alpha-3' not in comments,
+                valid)
+
+        kpis = WMOCoreMetadataProfileKeyPerformanceIndicators(data)
+        link_check = {'accessible': True, 'mime-type': 'text/html'}
+        with mock.patch('pywcmp.wcmp2.kpi.check_url',
+                        return_value=link_check):
+            for link, score in [
+                    ({'href': 'https://example.org/data.bufr',
+                      'type': 'application/bufr'}, 2),
+                    ({'href': 'https://example.org/data',
+                      'type': 'application/x-unknown'}, 1),
+                    ({'href': 'https://example.org/'}, 2)]:
+                result = kpis._check_link_health_single(link)
+                self.assertEqual(result[:2], (2, score))
+
+    def test_kpi_evaluator(self):
+        """Tests for a reusable KPI evaluator"""
+
+        file_ = 'data/wcmp2-passing.json'
+        with open(get_test_file_path(file_)) as fh:
+            data = json.load(fh)
+
+        with WMOCoreMetadataProfileKPIEvaluator(max_workers=2) as evaluator:
+            results = evaluator.evaluate_records([data, data], offline=True)
+
+        for result in results:
+            self.assertEqual(result['metadata_id'], data['id'])
+            self.assertEqual(result['summary']['total'], 18)
+            self.assertEqual(result['summary']['score'], 18)
+            self.assertTrue(result['summary']['offline'])
+
+        threads = set()
+
+        def check_url(*args, **kwargs):
+            threads.add(threading.current_thread().name)
+            return {'accessible': True, 'mime-type': 'text/html'}
+
+        # evaluations reuse the threads of the evaluator pool
+        with WMOCoreMetadataProfileKPIEvaluator(max_workers=2) as evaluator:
+            with mock.patch('pywcmp.wcmp2.kpi.check_url',
+                            side_effect=check_url), \
+                    mock.patch('pywcmp.wcmp2.kpi.ThreadPoolExecutor') as tpe:
+                results = evaluator.evaluate_records([data, data])
+                tpe.assert_not_called()
+
+        self.assertEqual(results[0]['tests'], results[1]['tests'])
+        self.assertTrue(threads)
+        self.assertLessEqual(len(threads), 2)
+        for name in threads:
+            self.assertTrue(name.startswith('pywcmp-links'))
+
+    def test_validate_record(self):
+        """Tests for combined ETS and KPI validation"""
+
+        file_ = 'data/wcmp2-passing.json'
+        with open(get_test_file_path(file_)) as fh:
+            data = json.load(fh)
+
+        report = validate_record(data, offline=True)
+
+        self.assertEqual(report['metadata_id'], data['id'])
+        self.assertEqual(report['ets']['report_type'], 'ets')
+        self.assertEqual(report['ets']['summary']['FAILED'], 0)
+        self.assertEqual(report['kpi']['report_type'], 'kpi')
+        self.assertEqual(report['kpi']['summary']['score'], 18)
+
+        data.pop('properties')
+
+        with self.assertRaises(ValueError):
+            validate_record(data, offline=True)
+
     def test_calculate_grade(self):
         self.assertEqual(calculate_grade(98), 'A')
         self.assertEqual(calculate_grade(77), 'B')
@@ -416,6 +802,658 @@ class WCMPUtilTest(unittest.TestCase):
         with open(get_test_file_path(file_)) as fh:
             _ = parse_wcmp(fh.read())
 
+    def test_get_userdir(self):
+        """test bundle location configuration"""
+
+        with mock.patch.dict(os.environ, {'PYWCMP_BUNDLE_DIR': ''}):
+            self.assertEqual(get_userdir(), Path.home() / '.pywcmp')
+
+        with mock.patch.dict(os.environ,
+                             {'PYWCMP_BUNDLE_DIR': '/opt/pywcmp'}):
+            self.assertEqual(get_userdir(), Path('/opt/pywcmp'))
+
+            set_userdir('/srv/pywcmp')
+            self.assertEqual(get_userdir(), Path('/srv/pywcmp'))
+
+            set_userdir(None)
+            self.assertEqual(get_userdir(), Path('/opt/pywcmp'))
+
+    def test_has_markup(self):
+        """test markup detection"""
+
+        self.assertTrue(has_markup('Temperature <b>forecast</b>'))
+        self.assertTrue(has_markup('Temperature<br/>forecast'))
+        self.assertFalse(has_markup('Temperature forecast'))
+        self.assertFalse(has_markup('Temperature < 0 and > -10'))
+        self.assertFalse(has_markup('Temperature <!-- forecast -->'))
+
+    def test_caching_format_checker(self):
+        """test that memoized format checks match jsonschema"""
+
+        values = [
+            '2024-08-09T14:29:23Z', '2024-02-30T00:00:00Z', 'a@example.org',
+            'https://example.org', 'example.org', '[a-z]+', '[a-z', 42
+        ]
+
+        checker = CachingFormatChecker(formats=FORMAT_CHECKERS)
+        format_checker = FormatChecker(formats=FORMAT_CHECKERS)
+
+        for _ in range(2):
+            for format_ in FORMAT_CHECKERS:
+                for value in values:
+                    self.assertEqual(checker.conforms(value, format_),
+                                     format_checker.conforms(value, format_),
+                                     (value, format_))
+
+        self.assertGreater(checker._get_verdict.cache_info().hits, 0)
+        self.assertIsNone(checker.check(['unhashable'], 'uri'))
+
+        schema = {'type': 'string', 'format': 'uri'}
+        errors = [e.message for e in Draft202012Validator(
+            schema, format_checker=checker).iter_errors('example.org')]
+        self.assertEqual(errors, ["'example.org' is not a 'uri'"])
+
+    def test_is_valid_created_datetime(self):
+        """test accepted creation datetimes"""
+
+        for value in ['2024-08-09T14:29:23Z', '2024-08-09T14:29:23.12Z',
+                      '2024-08-09T14:29:23+04:00', '2024-02-29T00:00:00Z']:
+            self.assertTrue(is_valid_created_datetime(value), value)
+
+        for value in ['2024-08-09T14:29:23', '2024-08-09',
+                      '2023-02-29T00:00:00Z',
+                      '2024-08-09T24:00:00Z', '2024-13-09T14:29:23Z',
+                      '2024-08-09T14:29:23+04:60', None, 20240809]:
+            self.assertFalse(is_valid_created_datetime(value), value)
+
+    def test_classify_url_error(self):
+        """test classification of URL access errors"""
+
+        # a local port nothing listens on refuses connections
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        result = check_url(f'http://127.0.0.1:{port}/', True, timeout=5)
+        self.assertFalse(result['accessible'])
+        self.assertEqual(result['error'], 'connection')
+
+        # .invalid is reserved, and never resolves (RFC 6761)
+        result = check_url('http://pywcmp.invalid/', True, timeout=5)
+        self.assertFalse(result['accessible'])
+        self.assertEqual(result['error'], 'dns')
+
+        cert_error = ssl.SSLCertVerificationError('certificate verify failed')
+        self.assertEqual(classify_url_error(URLError(cert_error)), 'tls')
+        self.assertTrue(is_ssl_verification_error(URLError(cert_error)))
+        self.assertTrue(is_ssl_verification_error(cert_error))
+        self.assertFalse(is_ssl_verification_error(
+            URLError(ssl.SSLError('handshake failure'))))
+        self.assertFalse(is_ssl_verification_error(
+            URLError(ConnectionRefusedError())))
+
+        self.assertEqual(classify_url_error(URLError(TimeoutError())),
+                         'timeout')
+        self.assertEqual(classify_url_error(socket.timeout()), 'timeout')
+        self.assertEqual(classify_url_error(
+            HTTPError('http://example.org', 404, 'Not Found', {}, None)),
+            'http')
+        self.assertEqual(classify_url_error(ValueError('unknown url type')),
+                         'invalid')
+
+    def test_fetch_record_unverified(self):
+        """test that records are not fetched without verified TLS"""
+
+        cert_error = URLError(ssl.SSLCertVerificationError(
+            'certificate verify failed'))
+
+        with mock.patch('pywcmp.util.urlopen',
+                        side_effect=cert_error) as urlopen:
+            with self.assertRaisesRegex(RuntimeError, 'certificate'):
+                fetch_record('https://example.org/record.json')
+
+        urlopen.assert_called_once()
+
+        with mock.patch('pywcmp.util.urlopen',
+                        side_effect=[cert_error, OSError('retried')]):
+            with self.assertRaisesRegex(RuntimeError, 'retried'):
+                fetch_record('https://example.org/record.json',
+                             allow_unverified=True)
+
+    def test_fetch_record_slow(self):
+        """test that a slowly trickling record times out"""
+
+        class SlowHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '100')
+                self.end_headers()
+                try:
+                    for i in range(100):
+                        self.wfile.write(b' ')
+                        self.wfile.flush()
+                        time.sleep(0.1)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/record.json'
+            start = time.monotonic()
+            with self.assertRaisesRegex(RuntimeError, 'Timed out'):
+                fetch_record(url, read_timeout=1)
+            self.assertLess(time.monotonic() - start, 3)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_iter_records(self):
+        """test reading records from archives and NDJSON"""
+
+        with open(get_test_file_path('data/wcmp2-passing.json'), 'rb') as fh:
+            content = fh.read()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            zip_file = Path(tmpdir) / 'records.zip'
+            with zipfile.ZipFile(zip_file, 'w') as zf:
+                zf.writestr('records/a.json', content)
+                zf.writestr('records/README.txt', 'not a record')
+
+            records = list(iter_records(str(zip_file)))
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0], (f'{zip_file}!records/a.json',
+                                          content))
+
+            ndjson_file = Path(tmpdir) / 'records.jsonl.gz'
+            with gzip.open(ndjson_file, 'wb') as fh:
+                line = json.dumps(json.loads(content)).encode('utf-8')
+                fh.write(line + b'\n\n' + line + b'\n')
+
+            records = list(iter_records(str(ndjson_file)))
+            self.assertEqual([r[0] for r in records],
+                             [f'{ndjson_file}:1', f'{ndjson_file}:3'])
+            self.assertEqual(json.loads(records[1][1]), json.loads(content))
+
+            ndjson_file = Path(tmpdir) / 'records.jsonl'
+            with ndjson_file.open('wb') as fh:
+                fh.write(b'\n'.join([line] * 5) + b'\n')
+
+            shards = [list(iter_records(str(ndjson_file), (number, 2)))
+                      for number in [1, 2]]
+            self.assertTrue(get_index_path(ndjson_file).exists())
+            self.assertEqual([len(shard) for shard in shards], [2, 3])
+            self.assertEqual(shards[1][0], (f'{ndjson_file}:3', line + b'\n'))
+
+            # the index is copied into an array, leaving no map open
+            offsets = load_index(ndjson_file)
+            self.assertEqual(offsets.tolist(),
+                             [i * (len(line) + 1) for i in range(5)])
+
+            # overlong lines are reported, without reading them whole
+            with ndjson_file.open('wb') as fh:
+                fh.write(b'{}\n' + b' ' * 250 + b'{}\n{}\n')
+            get_index_path(ndjson_file).unlink()
+
+            with mock.patch('pywcmp.batch.MAX_RECORD_SIZE', 100):
+                for shard in [None, (1, 1)]:
+                    records = list(iter_records(str(ndjson_file), shard))
+                    self.assertEqual([r[0] for r in records],
+                                     [f'{ndjson_file}:{i}' for i in [1, 2, 3]])
+                    self.assertIsInstance(records[1][1], RuntimeError)
+                    self.assertEqual(records[2][1], b'{}\n')
+
+            # and logged once, when validated
+            with self.assertLogs('pywcmp.batch', 'WARNING') as logs:
+                report = validate_content(*records[1], 'kpi', {})
+            self.assertEqual(len(logs.output), 1)
+            self.assertIn(f'{ndjson_file}:2', logs.output[0])
+            self.assertEqual(report, {
+                'source': f'{ndjson_file}:2',
+                'error': 'Record too large (> 100 bytes)'
+            })
+
+    def test_run_batch_resume(self):
+        """test resuming a batch run from its checkpoint"""
+
+        with open(get_test_file_path('data/wcmp2-passing.json'), 'rb') as fh:
+            line = json.dumps(json.load(fh)).encode('utf-8')
+
+        # offline KPIs, without ETS, so that no bundle is needed
+        options = {'fail_on_ets': False, 'offline': True}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ndjson_file = Path(tmpdir) / 'records.jsonl'
+            too_large = json.dumps({'padding': ' ' * len(line)}).encode()
+            ndjson_file.write_bytes(
+                b'\n'.join([line, b'{', too_large, line]))
+            output = Path(tmpdir) / 'reports.jsonl'
+
+            with mock.patch('pywcmp.batch.MAX_RECORD_SIZE', len(line) + 1):
+                failed = run_batch(str(ndjson_file), 'kpi',
+                                   output=str(output), **options)
+                self.assertEqual(failed, 2)
+
+                reports = output.read_text()
+                self.assertEqual(len(reports.splitlines()), 4)
+                self.assertIn('Record too large', reports.splitlines()[2])
+
+                # records done, including records that cannot be read,
+                # are skipped
+                with mock.patch('pywcmp.batch.validate_content') as validate:
+                    failed = run_batch(str(ndjson_file), 'kpi',
+                                       output=str(output), resume=True,
+                                       **options)
+                    validate.assert_not_called()
+
+                self.assertEqual(failed, 2)
+                self.assertEqual(output.read_text(), reports)
+
+            # the output of a checkpoint must not be lost or cut short
+            output.write_text(reports[:10])
+            with self.assertRaises(RuntimeError):
+                run_batch(str(ndjson_file), 'kpi', output=str(output),
+                          resume=True, **options)
+            self.assertEqual(output.read_text(), reports[:10])
+
+            output.unlink()
+            with self.assertRaises(RuntimeError):
+                run_batch(str(ndjson_file), 'kpi', output=str(output),
+                          resume=True, **options)
+            self.assertFalse(output.exists())
+
+            with self.assertRaises(ValueError):
+                run_batch(str(ndjson_file), 'kpi', resume=True, **options)
+
+            # errors are CLI errors from the CLI
+            result = CliRunner().invoke(
+                validate_kpi, [str(ndjson_file), '--resume'])
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn('requires an output file', result.output)
+
+            missing_dir = Path(tmpdir) / 'missing'
+            result = CliRunner().invoke(validate_kpi, [
+                str(ndjson_file), '--output', missing_dir / 'reports.jsonl'])
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn('Cannot open output', result.output)
+
+    def test_merge_reports(self):
+        """test merging batch reports"""
+
+        reports = [
+            {'source': 'a', 'report_type': 'ets', 'summary': {'PASSED': 12}},
+            {'source': 'b', 'error': 'Encoding error'},
+            {'source': 'a', 'report_type': 'ets', 'summary': {'FAILED': 1}}
+        ]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report_file = Path(tmpdir) / 'reports.jsonl'
+            report_file.write_text('\n'.join(map(json.dumps, reports)))
+
+            summary = merge_reports([report_file])
+
+        self.assertEqual(summary['records'], 2)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['ets']['failed'], 1)
+        self.assertEqual(summary['ets']['tests']['FAILED'], 1)
+        self.assertNotIn('kpi', summary)
+
+    def test_report_cache(self):
+        """test report cache"""
+
+        cache = ReportCache(size=1, ttl=60)
+
+        cache.put('a', {'foo': 'bar'})
+        self.assertEqual(cache.get('a')[0], {'foo': 'bar'})
+
+        cache.put('b', {'foo': 'baz'})
+        self.assertIsNone(cache.get('a'))
+
+        with mock.patch('time.time', return_value=1e12):
+            self.assertIsNone(cache.get('b'))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ReportCache(size=1, directory=tmpdir, disk_size=4)
+
+            for i, key in enumerate(['a', 'b', 'c', 'd', 'e']):
+                cache.put(key, {'foo': key})
+                os.utime(Path(tmpdir) / f'{key}.json', (i, i))
+
+            # pruned to the low water mark, least recently used first
+            cached = sorted(p.stem for p in Path(tmpdir).glob('*.json'))
+            self.assertEqual(cached, ['c', 'd', 'e'])
+
+            # the directory is not scanned again until full
+            with mock.patch.object(Path, 'glob') as glob:
+                cache.put('f', {'foo': 'f'})
+                glob.assert_not_called()
+
+        # legacy (unversioned) bundles are told apart by content
+        manifests = [{'manifest': {'wcmp-2/wcmp2-bundled.json': digest}}
+                     for digest in ['a', 'b']]
+        with mock.patch('pywcmp.cache.get_bundle_version',
+                        return_value=None), \
+                mock.patch('pywcmp.cache.get_bundle_resources',
+                           side_effect=manifests):
+            self.assertNotEqual(get_cache_key({'id': 'foo'}, 'ets'),
+                                get_cache_key({'id': 'foo'}, 'ets'))
+
+
+class WCMPBundleTest(unittest.TestCase):
+    """WCMP bundle management tests"""
+
+    def setUp(self):
+        """setup test fixtures, etc."""
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tmppath = Path(self.tmpdir.name)
+
+        self.source = self.tmppath / 'source'
+        (self.source / 'wcmp-2' / 'codelists').mkdir(parents=True)
+        (self.source / 'wcmp-2' / 'wcmp2-bundled.json').write_text('{}')
+        (self.source / 'wcmp-2' / 'codelists' / 'contact-role.csv').write_text(
+            'Name\nhost\n')
+        (self.source / 'wis2-topic-hierarchy').mkdir()
+        (self.source / 'wis2-topic-hierarchy' / 'channel.csv').write_text(
+            'Name\norigin\n')
+
+        set_userdir(self.tmppath / 'userdir')
+
+    def tearDown(self):
+        """return to pristine state"""
+
+        set_userdir(None)
+        self.tmpdir.cleanup()
+
+    def install_source(self):
+        """helper function to install the source bundle"""
+
+        stagingdir = self.tmppath / 'staging'
+        shutil.copytree(self.source, stagingdir)
+
+        return install_bundle(stagingdir)
+
+    def test_install_bundle(self):
+        """test installing a bundle as a version behind a pointer"""
+
+        userdir = self.tmppath / 'userdir'
+        (userdir / 'wcmp-2').mkdir(parents=True)
+
+        self.assertIsNone(get_bundle_version())
+        self.assertEqual(get_bundle_dir(), userdir)
+
+        version = self.install_source()
+
+        self.assertEqual(get_bundle_version(), version)
+        self.assertEqual((userdir / 'current').read_text(), version)
+        self.assertEqual(get_bundle_dir(), userdir / 'versions' / version)
+        self.assertEqual(get_bundle_dir_version(get_bundle_dir()), version)
+        self.assertIsNone(get_bundle_dir_version(userdir))
+        self.assertEqual(
+            (get_bundle_dir() / 'wcmp-2' / 'wcmp2-bundled.json').read_text(),
+            '{}')
+        self.assertEqual(sorted(get_bundle_manifest()), [
+            'wcmp-2/codelists/contact-role.csv',
+            'wcmp-2/wcmp2-bundled.json',
+            'wis2-topic-hierarchy/channel.csv'
+        ])
+
+        # legacy bundle directories and pointer staging files are removed
+        self.assertFalse((userdir / 'wcmp-2').exists())
+        self.assertEqual([p.name for p in userdir.iterdir()
+                          if p.name.startswith('.')], [])
+
+    def test_prune_bundles(self):
+        """test pruning of old bundle versions"""
+
+        versions = [self.install_source() for _ in range(4)]
+
+        versions_dir = self.tmppath / 'userdir' / 'versions'
+        self.assertEqual(sorted(p.name for p in versions_dir.iterdir()),
+                         versions[-BUNDLE_VERSIONS_KEEP:])
+        self.assertEqual(get_bundle_version(), versions[-1])
+
+    def test_sync_from_directory(self):
+        """test sync from a bundle directory"""
+
+        self.assertIsNone(get_bundle_version())
+
+        version = sync_bundle(self.source)
+
+        userdir = self.tmppath / 'userdir'
+        self.assertEqual(get_bundle_version(), version)
+        self.assertEqual((userdir / 'current').read_text(), version)
+        self.assertEqual(get_bundle_dir(), userdir / 'versions' / version)
+        self.assertEqual(
+            (get_bundle_dir() / 'wcmp-2' / 'wcmp2-bundled.json').read_text(),
+            '{}')
+        self.assertEqual(sorted(get_bundle_manifest()), [
+            'wcmp-2/codelists/contact-role.csv',
+            'wcmp-2/wcmp2-bundled.json',
+            'wis2-topic-hierarchy/channel.csv'
+        ])
+        self.assertEqual([p.name for p in userdir.iterdir()
+                          if p.name.startswith('.')], [])
+
+        # another bundle location (its active version is used)
+        set_userdir(self.tmppath / 'userdir2')
+        sync_bundle(userdir)
+        self.assertEqual(get_bundle_manifest(),
+                         get_bundle_manifest(userdir / 'versions' / version))
+
+    def test_export_and_sync_from_archive(self):
+        """test export round-trip through zip and tar archives"""
+
+        version = sync_bundle(self.source)
+        manifest = get_bundle_manifest()
+
+        for name in ['bundle.zip', 'bundle.tar', 'bundle.tar.gz']:
+            archive = self.tmppath / name
+            set_userdir(self.tmppath / 'userdir')
+            export_bundle(archive)
+
+            set_userdir(self.tmppath / name.replace('.', '-'))
+            self.assertNotEqual(sync_bundle(archive), version)
+            self.assertEqual(get_bundle_manifest(), manifest)
+
+        with self.assertRaises(ValueError):
+            export_bundle(self.tmppath / 'bundle.rar')
+
+    def test_invalid_bundle(self):
+        """test rejection of an incomplete bundle"""
+
+        version = sync_bundle(self.source)
+
+        shutil.rmtree(self.source / 'wis2-topic-hierarchy')
+
+        with self.assertRaises(RuntimeError):
+            sync_bundle(self.source)
+
+        userdir = self.tmppath / 'userdir'
+        self.assertEqual(get_bundle_version(), version)
+        self.assertEqual(len(list((userdir / 'versions').iterdir())), 1)
+        self.assertEqual([p.name for p in userdir.iterdir()
+                          if p.name.startswith('.')], [])
+
+        not_a_bundle = self.tmppath / 'bundle.txt'
+        not_a_bundle.write_text('not a bundle')
+
+        with self.assertRaises(RuntimeError):
+            sync_bundle(not_a_bundle)
+
+
+class WCMPServeTest(unittest.TestCase):
+    """WCMP validation service tests"""
+
+    def setUp(self):
+        """setup test fixtures, etc."""
+
+        self.record = get_test_file_path('data/wcmp2-passing.json')
+        with open(self.record, 'rb') as fh:
+            self.content = fh.read()
+
+    def start_server(self, server):
+        """helper function to serve requests in a thread"""
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def test_http(self):
+        """test the validation service and its thin client over HTTP"""
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                     ValidationRequestHandler)
+        self.start_server(server)
+        url = f'http://127.0.0.1:{server.server_port}'
+
+        with urlopen_(f'{url}/health') as response:
+            self.assertEqual(json.load(response)['status'], 'ok')
+
+        report = request_report(url, 'kpi', self.content, fail_on_ets=False,
+                                offline=True)
+        self.assertEqual(report['summary']['score'], 18)
+        self.assertTrue(report['summary']['offline'])
+
+        with self.assertRaises(RuntimeError):
+            request_report(url, 'kpi', b'{', fail_on_ets=False,
+                           offline=True)
+
+        with self.assertRaises(RuntimeError):
+            request_report(url, 'foo', self.content)
+
+        result = CliRunner().invoke(validate_kpi, [
+            self.record, '--server', url, '--no-fail-on-ets', '--offline',
+            '--summary'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('"score": 18', result.output)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'no Unix sockets')
+    def test_unix_socket(self):
+        """test the validation service over a Unix socket"""
+
+        from pywcmp.serve import UnixHTTPServer
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = f'{tmpdir}/pywcmp.sock'
+            server = UnixHTTPServer(socket_path, ValidationRequestHandler)
+            self.start_server(server)
+
+            report = request_report(f'unix://{socket_path}', 'kpi',
+                                    self.content, fail_on_ets=False,
+                                    offline=True)
+            self.assertEqual(report['summary']['score'], 18)
+
+    def test_workers_without_fork(self):
+        """test that pre-forked workers require os.fork"""
+
+        with mock.patch('pywcmp.serve.os', spec=[]):
+            result = CliRunner().invoke(serve, ['--workers', '2'])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn('os.fork', result.output)
+
+
+@unittest.skipIf(pygeoapi_plugin is None, 'pygeoapi not installed')
+class WCMPPygeoapiTest(unittest.TestCase):
+    """WCMP pygeoapi plugin tests"""
+
+    def setUp(self):
+        """setup test fixtures, etc."""
+
+        with open(get_test_file_path('data/wcmp2-passing.json')) as fh:
+            self.record = json.load(fh)
+
+    def test_admission_controller(self):
+        """test admission and fast rejection of KPI jobs"""
+
+        admission = pygeoapi_plugin.AdmissionController(
+            max_jobs=1, max_queue=1, queue_timeout=0.1, link_workers=1)
+        self.addCleanup(admission.evaluator.close)
+
+        with admission.admit():
+            # the job slot is taken: the next job queues, then times out
+            with self.assertRaisesRegex(pygeoapi_plugin.ProcessorExecuteError,
+                                        'Timed out'):
+                with admission.admit():
+                    pass
+
+        rejected = threading.Event()
+
+        def submit():
+            try:
+                with admission.admit():
+                    pass
+            except pygeoapi_plugin.ProcessorExecuteError:
+                rejected.set()
+
+        with admission.admit():
+            # one job running and one queued: further jobs are rejected
+            # immediately
+            queued = threading.Thread(target=submit)
+            queued.start()
+            while admission._pending < 2:
+                time.sleep(0.01)
+
+            start = time.monotonic()
+            with self.assertRaisesRegex(pygeoapi_plugin.ProcessorExecuteError,
+                                        'Too many'):
+                with admission.admit():
+                    pass
+            self.assertLess(time.monotonic() - start, 0.1)
+
+        queued.join()
+        self.assertEqual(admission._pending, 0)
+
+        with admission.admit():
+            pass
+
+    def test_kpi_processor(self):
+        """test cached reports of the (warmed) KPI process"""
+
+        processor = pygeoapi_plugin.WCMP2KPIProcessor({
+            'name': 'pywcmp-wis2-wcmp2-kpi',
+            'cache': {'size': 1}
+        })
+
+        data = {'record': self.record, 'offline': True}
+
+        _, report = processor.execute(data)
+        self.assertEqual(report['summary']['score'], 18)
+
+        _, report = processor.execute(data)
+        self.assertTrue(report['cache']['hit'])
+
+        for deadline in [0, -1, 'soon', True]:
+            with self.assertRaises(pygeoapi_plugin.ProcessorExecuteError):
+                processor.execute({**data, 'deadline': deadline})
+
+    def test_kpi_batch_processor(self):
+        """test a KPI batch with one bad record"""
+
+        processor = pygeoapi_plugin.WCMP2KPIBatchProcessor({
+            'name': 'pywcmp-wis2-wcmp2-kpi-batch'
+        })
+
+        _, result = processor.execute({
+            'records': [self.record, 42, self.record],
+            'offline': True,
+            'deadline': 30
+        })
+
+        self.assertEqual(result['summary']['records'], 3)
+        self.assertEqual(result['summary']['evaluated'], 2)
+        self.assertEqual(result['summary']['errors'], 1)
+        self.assertIn('error', result['results'][1])
+        self.assertEqual(result['results'][2]['summary']['score'], 18)
+
+        with self.assertRaises(pygeoapi_plugin.ProcessorExecuteError):
+            processor.execute({'records': []})
+
 
 if __name__ == '__main__':
     unittest.main()